@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""End-to-end and per-function build benchmarks over synthetic corpora.
+
+For each corpus size, generates (once, under --work) a corpus with
+bench/corpus.py, then runs build.py in a subprocess for a cold build (fresh
+output, no fragment cache) and a warm no-op rebuild, recording wall time,
+peak RSS and output bytes. It also times convert_text, linkify and the
+index card assembly in-process on one generated page.
+
+  python bench/build_bench.py --sizes 50 5000 --save bench/baseline.json
+  python bench/build_bench.py --sizes 50 --compare bench/baseline.json
+
+--compare exits non-zero if any metric regresses by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import build  # noqa: E402
+import corpus  # noqa: E402
+
+# Metrics where smaller is better; everything recorded is one of these.
+TIME_KEYS = ("cold_s", "warm_s", "convert_text_ms", "linkify_ms", "state_cards_ms")
+
+def tree_bytes(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+    return total
+
+def run_build(src, out, extra):
+    """Run build.py in a subprocess; returns (seconds, peak RSS of that child in KB)."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(ROOT / "build.py"), "--src", str(src), "--out", str(out), *extra],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - started
+    # ru_maxrss over all waited-for children is a high-water mark, so it only
+    # reflects this run if it is the largest so far; sizes run smallest first.
+    peak = max(before, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return elapsed, peak
+
+def bench_functions(src):
+    """Time the hot functions on one generated page and a card grid of every page."""
+    page = sorted(src.glob("church-compliance-deadlines-*.md"))[0]
+    text = page.read_text(encoding="utf-8")
+    body = build.convert_text(text)
+    entries = [p.entry for p in build.discover_pages(src)]
+    results = {}
+    for name, fn in (
+        ("convert_text_ms", lambda: build.convert_text(text)),
+        ("linkify_ms", lambda: build.linkify(body)),
+        ("state_cards_ms", lambda: build.render_state_cards(entries)),
+    ):
+        number = 20
+        results[name] = min(timeit.repeat(fn, number=number, repeat=3)) / number * 1000
+    return results
+
+def bench_size(pages, work, jobs):
+    src = work / f"corpus-{pages}"
+    if not (src / "church-compliance-directory-index.md").exists():
+        print(f"  generating {pages} pages ...", flush=True)
+        corpus.generate(src, pages)
+    out_root = work / f"out-{pages}"
+    shutil.rmtree(out_root, ignore_errors=True)
+    out = out_root / "docs"
+    # The generated regions are not the 50 states, so none of those sources exist.
+    extra = ["--jobs", str(jobs), "--allow-missing"]
+    cold_s, cold_rss = run_build(src, out, extra + ["--no-cache", "--force"])
+    warm_s, _ = run_build(src, out, extra)
+    result = {
+        "pages": pages,
+        "cold_s": round(cold_s, 3),
+        "warm_s": round(warm_s, 3),
+        "peak_rss_kb": cold_rss,
+        "source_bytes": tree_bytes(src),
+        "output_bytes": tree_bytes(out),
+    }
+    result.update({k: round(v, 4) for k, v in bench_functions(src).items()})
+    return result
+
+def compare(results, baseline, threshold):
+    """Print per-metric deltas against a baseline; returns True if nothing regressed."""
+    ok = True
+    for size, result in results.items():
+        base = baseline.get("results", {}).get(size)
+        if base is None:
+            print(f"  {size} pages: no baseline")
+            continue
+        for key in TIME_KEYS + ("peak_rss_kb", "output_bytes"):
+            if key not in base or not base[key]:
+                continue
+            delta = (result[key] - base[key]) / base[key]
+            flag = ""
+            if delta > threshold:
+                flag = "  REGRESSION"
+                ok = False
+            print(f"  {size:>6} pages  {key:<16} {base[key]:>12} -> {result[key]:>12}  {delta:+7.1%}{flag}")
+    return ok
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 5000, 50000])
+    parser.add_argument("--jobs", type=int, default=1, help="passed through to build.py --jobs")
+    parser.add_argument("--work", type=Path, default=Path("/tmp/cc-directory-bench"),
+                        help="where corpora and outputs are kept between runs")
+    parser.add_argument("--save", type=Path, help="write results as a new baseline JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative slowdown that counts as a regression (default 0.15)")
+    args = parser.parse_args(argv)
+
+    args.work.mkdir(parents=True, exist_ok=True)
+    results = {}
+    for pages in sorted(args.sizes):
+        print(f"{pages} pages:", flush=True)
+        result = bench_size(pages, args.work, args.jobs)
+        results[str(pages)] = result
+        print("  " + "  ".join(f"{k}={v}" for k, v in result.items() if k != "pages"))
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            "python": platform.python_version(),
+            "markdown": build.markdown.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "jobs": args.jobs,
+            "results": results,
+        }, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.save}")
+    if args.compare:
+        print(f"Compared with {args.compare}:")
+        if not compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Generate a synthetic source corpus shaped like the real state guides.
+
+Each page gets YAML frontmatter, the disclaimer blockquote, a "Quick
+operational snapshot" table, numbered "Verified ... filing points"
+sections, a checklist and a URL-dense Sources list, named
+church-compliance-deadlines-<slug>-2026-draft.md so build.py discovers it.
+An index markdown with the table build.py replaces by the card grid is
+written alongside. Output is deterministic for a given page count and seed.
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+AGENCIES = [
+    ("Secretary of State", "sos", "Annual report", "Annually by April 15"),
+    ("Department of Revenue", "dor", "Withholding return", "Quarterly"),
+    ("Department of Labor", "dol", "Unemployment insurance report", "Quarterly"),
+    ("Attorney General", "ag", "Charitable registration renewal", "Annually by May 15"),
+    ("Department of Children and Family Services", "dcfs", "Mandated reporter training", "Every 3 years"),
+    ("Paid Leave Division", "pfml", "Paid leave contribution report", "Quarterly"),
+]
+OWNERS = ["Admin / Secretary", "Finance / Payroll", "Finance / CPA", "Board Secretary", "Family ministry / HR"]
+
+def page_markdown(slug, name, region, rng, sections, sources):
+    picked = rng.sample(AGENCIES, k=min(sections, len(AGENCIES)))
+    lines = [
+        "---",
+        f"title: Church Compliance Deadlines in {name} (2026)",
+        f"slug: {slug}",
+        f"name: {name}",
+        f"region: {region}",
+        f'description: "{picked[0][2]}, {picked[1][0]} filings for {name} churches."',
+        "status: draft",
+        "---",
+        "",
+        f"# Church Compliance Deadlines in {name} (2026)",
+        "",
+        "> **This is a directory of publicly available official resources — not legal or tax advice.** "
+        "Consult a licensed attorney or CPA.",
+        "",
+        f"{name} churches juggle several recurring obligations. See https://www.irs.gov/charities-non-profits "
+        f"and https://{slug}.gov/nonprofits for the official starting points.",
+        "",
+        "## Quick operational snapshot",
+        "",
+        "| Item | Typical cadence | Owner | Why it matters |",
+        "|---|---|---|---|",
+    ]
+    for agency, _, filing, cadence in picked:
+        lines.append(f"| {filing} ({agency}) | {cadence} | {rng.choice(OWNERS)} | Keeps the entity in good standing |")
+    lines += ["", f"## Verified {name} filing points", ""]
+    for i, (agency, code, filing, cadence) in enumerate(picked, 1):
+        lines += [
+            f"### {i}) {filing} — {cadence.lower()}",
+            "",
+            f"The {name} {agency} requires the {filing.lower()} ({cadence.lower()}). "
+            f"Forms are at https://{code}.{slug}.gov/forms/{i} and guidance at "
+            f"https://{code}.{slug}.gov/guidance?topic={i}&lang=en.",
+            "",
+            "**Operational takeaway:** assign an owner and set a reminder 60 days ahead.",
+            "",
+        ]
+    lines += [
+        f"## Monthly church compliance checklist ({name} ops)",
+        "",
+        *(f"- Confirm {filing.lower()} status" for _, _, filing, _ in picked),
+        "",
+        "---",
+        "",
+        "## Sources",
+        "",
+    ]
+    for i in range(sources):
+        agency, code, filing, _ = AGENCIES[i % len(AGENCIES)]
+        lines.append(f"- {name} {agency} — {filing} (accessed 2026-02-17): "
+                     f"https://{code}.{slug}.gov/resources/{i}/{filing.lower().replace(' ', '-')}")
+    return "\n".join(lines) + "\n"
+
+def index_markdown(pages):
+    lines = [
+        "---",
+        "title: Church Compliance Directory",
+        "---",
+        "",
+        "# Church Compliance Directory",
+        "",
+        "> **Not legal or tax advice.** These guides are operational checklists for planning.",
+        "",
+        "---",
+        "",
+        "## Available State Guides",
+        "",
+        "| State | Guide |",
+        "|---|---|",
+    ]
+    lines += [f"| {name} | [guide](states/{slug}.html) |" for slug, name in pages]
+    lines += ["", "## About", "", "Maintained by https://compliancecalendar.app", ""]
+    return "\n".join(lines)
+
+def generate(out_dir, pages, seed=2026, sections=5, sources=12):
+    """Write `pages` synthetic sources plus the index into out_dir; returns bytes written."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    total = 0
+    names = []
+    for n in range(pages):
+        slug = f"region-{n:06d}"
+        name = f"Region {n:06d}"
+        names.append((slug, name))
+        region = f"District {n // 250 + 1:02d}"
+        text = page_markdown(slug, name, region, rng, sections, sources)
+        path = out_dir / f"church-compliance-deadlines-{slug}-2026-draft.md"
+        path.write_text(text, encoding="utf-8")
+        total += len(text.encode("utf-8"))
+    text = index_markdown(names)
+    (out_dir / "church-compliance-directory-index.md").write_text(text, encoding="utf-8")
+    return total + len(text.encode("utf-8"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("out", type=Path, help="directory to write the corpus into")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--sources", type=int, default=12, help="Sources list entries per page")
+    args = parser.parse_args(argv)
+    written = generate(args.out, args.pages, seed=args.seed, sources=args.sources)
+    print(f"Wrote {args.pages} pages ({written / 1024:.0f} KB) to {args.out}")
+
+if __name__ == "__main__":
+    main()
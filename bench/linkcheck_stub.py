@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Exercise linkcheck.py against a local stub HTTP server.
+
+Starts a threaded server on 127.0.0.1 with one route per behaviour the
+checker has to handle, checks every route twice with a LinkCache in a
+temporary directory, and exits non-zero if any expectation fails:
+
+  /ok          200 to HEAD
+  /no-head     405 to HEAD, 200 to GET (HEAD -> GET fallback)
+  /moved       301 to /ok (redirect followed, final URL recorded)
+  /loop        302 to itself (too many redirects -> error)
+  /dead        404 to HEAD and GET (broken)
+  closed port  connection refused (broken, error recorded)
+
+The second pass must answer the OK links from the cache without
+requesting them again, and re-check the broken ones.
+
+  python bench/linkcheck_stub.py
+"""
+
+import socket
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import linkcheck  # noqa: E402
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = {}
+    lock = threading.Lock()
+
+    def answer(self, method):
+        with self.lock:
+            self.requests[self.path] = self.requests.get(self.path, 0) + 1
+        if self.path == "/ok":
+            status, location = 200, None
+        elif self.path == "/no-head":
+            status, location = (405, None) if method == "HEAD" else (200, None)
+        elif self.path == "/moved":
+            status, location = 301, "/ok"
+        elif self.path == "/loop":
+            status, location = 302, "/loop"
+        else:
+            status, location = 404, None
+        body = b"" if method == "HEAD" else b"stub\n"
+        self.send_response(status)
+        if location:
+            self.send_header("Location", location)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.answer("HEAD")
+
+    def do_GET(self):
+        self.answer("GET")
+
+    def log_message(self, format, *args):
+        pass
+
+def closed_port():
+    """A local port with nothing listening on it."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    refused = f"http://127.0.0.1:{closed_port()}/gone"
+    urls = [f"{base}/ok", f"{base}/no-head", f"{base}/moved", f"{base}/loop", f"{base}/dead", refused]
+    failures = []
+
+    def expect(condition, message):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = Path(tmp) / "links.json"
+            cache = linkcheck.LinkCache(cache_path, ttl=3600)
+            results, hits = linkcheck.check_links(urls, cache, concurrency=4, per_host=2, timeout=2)
+            cache.save(set(urls))
+            print("First pass:")
+            expect(hits == 0, "no cache hits on an empty cache")
+            expect(results[f"{base}/ok"]["ok"] and results[f"{base}/ok"]["method"] == "HEAD",
+                   "/ok passes with HEAD")
+            expect(results[f"{base}/no-head"]["ok"] and results[f"{base}/no-head"]["method"] == "GET",
+                   "/no-head falls back to GET")
+            expect(results[f"{base}/moved"]["ok"] and results[f"{base}/moved"]["final"] == f"{base}/ok",
+                   "/moved follows the redirect and records the final URL")
+            expect(not results[f"{base}/loop"]["ok"] and results[f"{base}/loop"]["error"],
+                   "/loop fails with a redirect error")
+            expect(not results[f"{base}/dead"]["ok"] and results[f"{base}/dead"]["status"] == 404,
+                   "/dead is broken with status 404")
+            expect(not results[refused]["ok"] and results[refused]["error"],
+                   "a refused connection is broken with an error")
+
+            before = dict(StubHandler.requests)
+            results, hits = linkcheck.check_links(urls, linkcheck.LinkCache(cache_path, ttl=3600),
+                                                  concurrency=4, per_host=2, timeout=2)
+            print("Second pass (cached):")
+            expect(hits == 3, f"the 3 OK links come from the cache (got {hits})")
+            expect(all(StubHandler.requests.get(path) == before.get(path) for path in ("/ok", "/no-head", "/moved")),
+                   "cached links are not requested again")
+            expect(StubHandler.requests.get("/dead", 0) > before.get("/dead", 0),
+                   "broken links are checked again")
+
+            results, hits = linkcheck.check_links(urls, linkcheck.LinkCache(cache_path, ttl=0),
+                                                  concurrency=4, per_host=2, timeout=2)
+            print("Third pass (TTL expired):")
+            expect(hits == 0, f"nothing is fresh with a zero TTL (got {hits})")
+    finally:
+        server.shutdown()
+    print(f"{len(failures)} failure(s).")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
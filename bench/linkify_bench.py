@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Benchmark build.linkify against the previous lookbehind-regex linkify.
+
+Generates a Sources-heavy page (bullets of bare URLs, already-linked URLs,
+inline code) and times both implementations at increasing sizes, so the
+per-KB cost shows whether each scales linearly.
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import build  # noqa: E402
+
+def linkify_regex(html):
+    """The original linkify: one regex with four lookbehinds over the whole page."""
+    return re.sub(
+        r'(?<!href=")(?<!href=\')(?<!src=")(?<!src=\')(https?://[^\s<>"\')\]]+)',
+        r'<a href="\1" target="_blank" rel="noopener">\1</a>',
+        html,
+    )
+
+def make_page(items):
+    parts = ["<h1>Benchmark State</h1>\n<p>Intro text without links.</p>\n<h2>Sources</h2>\n<ul>\n"]
+    for i in range(items):
+        if i % 3 == 0:
+            parts.append(f'<li>Agency {i}: <a href="https://agency{i}.gov/page">https://agency{i}.gov/page</a></li>\n')
+        elif i % 3 == 1:
+            parts.append(f"<li>Agency {i} (accessed 2026-02-17): https://agency{i}.gov/forms/{i}.pdf?x=1&amp;y=2</li>\n")
+        else:
+            parts.append(f"<li>See <code>https://example.com/{i}</code> and https://www.irs.gov/p{i}</li>\n")
+    parts.append("</ul>\n")
+    return "".join(parts)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="number of Sources list items per generated page")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>8} {'KB':>8} {'regex ms':>10} {'linkify ms':>13} {'regex us/KB':>12} {'new us/KB':>10}")
+    for items in args.sizes:
+        page = make_page(items)
+        kb = len(page) / 1024
+        number = max(1, 2000 // items)
+        old = min(timeit.repeat(lambda: linkify_regex(page), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: build.linkify(page), number=number, repeat=args.repeat)) / number
+        print(f"{items:>8} {kb:>8.0f} {old * 1e3:>10.2f} {new * 1e3:>13.2f} "
+              f"{old * 1e6 / kb:>12.1f} {new * 1e6 / kb:>10.1f}")
+    nested = linkify_regex(make_page(3)).count("\"><a href=\"")
+    print(f"\nnested anchors produced by the old regex on a 3-item page: {nested}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,50 @@
 #!/usr/bin/env python3
 """Build static HTML from compliance directory markdown files."""
 
+import argparse
+import contextlib
+import cProfile
+import filecmp
+import functools
+import gzip
+import hashlib
+import html
+import json
 import markdown
+import mimetypes
+import os
 import re
 import shutil
+import socketserver
+import sqlite3
+import string
+import tempfile
+import threading
+import time
+import tracemalloc
+import wsgiref.simple_server
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+import deadlines
+import linkcheck
+import search
+import sitemap
+
+try:
+    import yaml
+    # libyaml's loader when PyYAML was built with it: same results, several times faster.
+    YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+except ImportError:  # PyYAML is optional; parse_frontmatter falls back to key: value lines
+    yaml = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; --compress br needs it
+    brotli = None
+
 SRC = Path("/data/vault/projects/compliance-tracker/content")
 OUT = Path("/tmp/cc-directory/docs")
 
@@ -134,13 +173,13 @@ HTML_TEMPLATE = """<!DOCTYPE html>
   <meta name="viewport" content="width=device-width, initial-scale=1.0">
   <title>{title} | Church Compliance Directory</title>
   <meta name="description" content="{description}">
-  <style>{css}</style>
+  {styles}
 </head>
 <body>
 <nav>
   <span class="brand">Church<span>Compliance</span>.guide</span>
   <a href="/index.html">Directory</a>
-  <div class="spacer"></div>
+  <div class="spacer"></div>{search}
   <a class="cta" href="https://compliancecalendar.app">Get Compliance Tracker \u2192</a>
 </nav>
 <div class="container">
@@ -148,12 +187,14 @@ HTML_TEMPLATE = """<!DOCTYPE html>
 </div>
 <footer>
   <p>Church Compliance Directory \u2014 a free resource by <a href="https://compliancecalendar.app">Compliance Tracker</a></p>
-  <p style="margin-top:0.4rem">Not legal or tax advice. Links point to official government agency pages. Last updated Feb 2026.</p>
+  <p style="margin-top:0.4rem">Not legal or tax advice. Links point to official government agency pages. Last updated {updated}.</p>
 </footer>
 </body>
 </html>"""
 
-# (url_slug, display_name, meta_description)
+# (url_slug, display_name, meta_description) -- fallback metadata for state
+# sources whose frontmatter has no name/description. Pages themselves are
+# discovered from SRC by discover_pages().
 STATE_PAGES = [
     ("alabama",        "Alabama",         "SOS nonprofit filings, ALDOR withholding, DOL UI for AL churches."),
     ("alaska",         "Alaska",          "CBPL biennial report, no state income tax, DOL UI for AK churches."),
@@ -207,83 +248,1933 @@ STATE_PAGES = [
     ("wyoming",        "Wyoming",         "SOS annual report, no state income tax, DWS UI for WY churches."),
 ]
 
-md_parser = markdown.Markdown(extensions=["tables", "fenced_code"])
+# --css modes: inline the whole stylesheet, link a fingerprinted asset, or
+# link the asset and inline only the above-the-fold rules.
+CSS_MODES = ("inline", "external", "critical")
+CRITICAL_SECTIONS = ("", "Nav", "Layout", "Disclaimer", "Typography")
 
-def render_page(title, description, body_html, out_path):
-    html = HTML_TEMPLATE.format(
-        title=title,
-        description=description,
-        css=CSS,
-        body=body_html,
-    )
-    out_path.write_text(html, encoding="utf-8")
-    print(f"  wrote {out_path.name}")
+MD_EXTENSIONS = ["tables", "fenced_code"]
+md_parser = markdown.Markdown(extensions=MD_EXTENSIONS)
+
+INDEX_SRC_NAME = "church-compliance-directory-index.md"
+# Directories with more cards than this are paginated and split into
+# per-region landing pages; smaller ones keep a single grid on index.html.
+CARDS_PER_PAGE = 60
+# Bump when listing/card markup changes so the index and listings are re-rendered.
+CARDS_VERSION = 2
+LISTING_PREFIXES = ("index-", "regions/", "cards/")
+
+@dataclass(frozen=True)
+class Edition:
+    """One edition of the directory: which sources it reads, where it goes, how it is dated.
+
+    Sources are church-compliance-deadlines-<slug>-<suffix>.md, so "2026-draft"
+    and "2026" (published) editions can live side by side in one SRC. out=None
+    means --out (or, with several editions, <OUT parent>/<suffix>/<OUT name>);
+    updated is the footer's "Last updated" text; it is required, because
+    anything derived from the files (mtimes) would change with every checkout
+    and re-render the whole edition.
+    """
+    suffix: str = "2026-draft"
+    out: Path = None
+    updated: str = None
+
+    @property
+    def source_re(self):
+        return re.compile(rf"church-compliance-deadlines-(?P<slug>[a-z0-9-]+)-{re.escape(self.suffix)}\.md")
+
+    @property
+    def year(self):
+        """Year the guides cover; the deadline calendar feeds start from it."""
+        return int(self.suffix[:4]) if self.suffix[:4].isdigit() else time.localtime().tm_year
+
+DEFAULT_EDITION = Edition("2026-draft", updated="Feb 2026")
+FRONTMATTER_RE = re.compile(r"^---\n(.*?)\n---\n", re.DOTALL)
+STATE_META = {slug: (name, description) for slug, name, description in STATE_PAGES}
+
+# Default landing-page grouping for the state guides (US Census regions);
+# other pages name theirs with a "region" frontmatter key.
+CENSUS_REGIONS = {
+    "Northeast": "connecticut maine massachusetts new-hampshire new-jersey new-york "
+                 "pennsylvania rhode-island vermont",
+    "Midwest": "illinois indiana iowa kansas michigan minnesota missouri nebraska "
+               "north-dakota ohio south-dakota wisconsin",
+    "South": "alabama arkansas delaware florida georgia kentucky louisiana maryland "
+             "mississippi north-carolina oklahoma south-carolina tennessee texas "
+             "virginia west-virginia",
+    "West": "alaska arizona california colorado hawaii idaho montana nevada new-mexico "
+            "oregon utah washington wyoming",
+}
+REGION_OF = {slug: region for region, slugs in CENSUS_REGIONS.items() for slug in slugs.split()}
+
+LAZY_CARDS_JS = """<script>
+(function () {
+  var grid = document.getElementById("cards"), more = document.getElementById("more-cards");
+  var pager = document.getElementById("pager");
+  if (!grid || !more || !more.dataset.next || !window.IntersectionObserver || !window.fetch) { return; }
+  if (pager) { pager.hidden = true; }
+  function esc(s) {
+    return String(s).replace(/[&<>"]/g, function (c) {
+      return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c];
+    });
+  }
+  var busy = false;
+  var io = new IntersectionObserver(function (entries) {
+    if (!entries[0].isIntersecting || busy || !more.dataset.next) { return; }
+    busy = true;
+    fetch(more.dataset.next).then(function (r) { return r.json(); }).then(function (chunk) {
+      grid.insertAdjacentHTML("beforeend", chunk.cards.map(function (c) {
+        return '<div class="state-card">\\n  <h3>' + esc(c[1]) + "</h3>\\n  <p>" + esc(c[2]) +
+          '</p>\\n  <a href="' + esc(c[0]) + '">View ' + esc(c[1]) + " guide \\u2192</a>\\n</div>\\n";
+      }).join(""));
+      busy = false;
+      if (chunk.next) {
+        more.dataset.next = chunk.next;
+        io.unobserve(more);
+        io.observe(more);
+      } else {
+        io.disconnect();
+      }
+    }).catch(function () {
+      io.disconnect();
+      if (pager) { pager.hidden = false; }
+    });
+  }, {rootMargin: "800px"});
+  io.observe(more);
+})();
+</script>
+"""
+MANIFEST_VERSION = 1
+# Bump when linkify output changes so cached pages are re-rendered.
+LINKIFY_VERSION = 2
+# Bump when PageShell changes how slots are filled (2: title/description escaped).
+SHELL_VERSION = 2
+
+class StageProfiler:
+    """Opt-in per-page, per-stage wall time (and tracemalloc peak) recorder.
+
+    Work that belongs to no single page (the CSS asset, search/data/sitemap
+    files) is recorded under SITE_KEY.
+    """
+
+    SITE_KEY = "site"
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.pages = {}
+        self.current = None
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start_page(self, key):
+        self.current = self.pages.setdefault(key, {})
+
+    def take(self, key):
+        """Remove and return a page's stats (pool workers send these back to the parent)."""
+        return self.pages.pop(key, {})
+
+    def merge(self, key, stats):
+        page = self.pages.setdefault(key, {})
+        for name, values in stats.items():
+            totals = page.setdefault(name, {})
+            for field_name, value in values.items():
+                totals[field_name] = totals.get(field_name, 0) + value
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.memory:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.current is None:
+                self.start_page(self.SITE_KEY)
+            stats = self.current.setdefault(name, {"ms": 0.0})
+            stats["ms"] += elapsed * 1000
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1] - before
+                stats["alloc_bytes"] = stats.get("alloc_bytes", 0) + max(peak, 0)
+
+    def report(self):
+        pages = {}
+        stages = {}
+        for key, page_stages in self.pages.items():
+            total = sum(values["ms"] for values in page_stages.values())
+            pages[key] = {"total_ms": round(total, 3), "stages": page_stages}
+            for name, values in page_stages.items():
+                totals = stages.setdefault(name, {"ms": 0.0, "pages": 0})
+                totals["ms"] += values["ms"]
+                totals["pages"] += 1
+                if "alloc_bytes" in values:
+                    totals["alloc_bytes"] = totals.get("alloc_bytes", 0) + values["alloc_bytes"]
+        return {"memory": self.memory, "stages": stages, "pages": pages}
+
+profiler = None
+NO_STAGE = contextlib.nullcontext()
+
+def stage(name):
+    """Time a build stage when profiling is on; a no-op context otherwise."""
+    return NO_STAGE if profiler is None else profiler.stage(name)
+
+def site_stages():
+    """Charge the stages that follow to the profile's site-wide bucket, not the last page."""
+    if profiler is not None:
+        profiler.start_page(StageProfiler.SITE_KEY)
+
+def print_profile_summary(report, top):
+    print(f"\nSlowest {top} pages:")
+    slowest = sorted(report["pages"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+    for key, page in slowest[:top]:
+        worst = max(page["stages"].items(), key=lambda item: item[1]["ms"])
+        print(f"  {page['total_ms']:8.2f} ms  {key}  (slowest stage: {worst[0]} {worst[1]['ms']:.2f} ms)")
+    print("Stage totals:")
+    for name, values in sorted(report["stages"].items(), key=lambda item: item[1]["ms"], reverse=True):
+        alloc = f"  {values['alloc_bytes'] / 1024:10.0f} KB alloc" if "alloc_bytes" in values else ""
+        print(f"  {name:<12} {values['ms']:10.2f} ms over {values['pages']} pages{alloc}")
+
+def init_worker(profile=None):
+    """Give each pool worker its own Markdown instance (and profiler, if enabled)."""
+    global md_parser, profiler
+    md_parser = markdown.Markdown(extensions=MD_EXTENSIONS)
+    if profile is not None:
+        profiler = StageProfiler(memory=profile)
+
+def css_sections(css):
+    """Split CSS into {section name: rules} on its /* Name */ comments."""
+    parts = re.split(r"^/\* (.+?) \*/$", css, flags=re.MULTILINE)
+    sections = {"": parts[0]}
+    for name, rules in zip(parts[1::2], parts[2::2]):
+        sections[name] = rules
+    return sections
+
+def critical_css():
+    sections = css_sections(CSS)
+    return "".join(sections.get(name, "") for name in CRITICAL_SECTIONS)
+
+def css_asset_path():
+    """Output path of the fingerprinted stylesheet, relative to OUT."""
+    digest = hashlib.sha256(CSS.encode("utf-8")).hexdigest()[:10]
+    return f"assets/site.{digest}.css"
+
+def page_styles(mode):
+    """Return the <head> markup that loads the stylesheet for the given --css mode."""
+    if mode == "inline":
+        return f"<style>{CSS}</style>"
+    link = f'<link rel="stylesheet" href="/{css_asset_path()}">'
+    if mode == "critical":
+        # The full sheet must not block first paint: load it as print media and
+        # switch it on once fetched (the noscript link covers no-JS browsers).
+        deferred = (f'<link rel="stylesheet" href="/{css_asset_path()}" media="print" '
+                    f'onload="this.media=\'all\'">')
+        return f"<style>{critical_css()}</style>\n  {deferred}\n  <noscript>{link}</noscript>"
+    return link
+
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+# Space before ":" is kept: "a :hover" and "a:hover" select different things.
+CSS_SPACE_RE = re.compile(r"\s*([{};,>])\s*|(:)\s+")
+
+def minify_css(css):
+    """Drop comments and optional whitespace (and each block's last semicolon)."""
+    css = CSS_COMMENT_RE.sub("", css)
+    css = " ".join(css.split())
+    css = CSS_SPACE_RE.sub(lambda m: m.group(1) or m.group(2), css)
+    return css.replace(";}", "}").strip()
+
+# Tags around which whitespace never renders; between other (inline) tags a
+# run of whitespace still collapses to one space.
+BLOCK_TAGS = frozenset("""
+    doctype html head body title meta link style script base nav header footer main section
+    article aside div p h1 h2 h3 h4 h5 h6 ul ol li dl dt dd table thead tbody tfoot tr th td
+    caption hr br form pre blockquote figure figcaption noscript
+""".split())
+# Elements whose content is kept byte-for-byte (style content is minified as CSS).
+HTML_TOKEN_RE = re.compile(
+    r"<!--(?!\[if).*?-->"
+    r"|<(?P<raw>pre|textarea|script|style)\b[^>]*>.*?</(?P=raw)\s*>"
+    r"|<[!/]?(?P<tag>[a-zA-Z][a-zA-Z0-9]*)[^>]*>",
+    re.DOTALL | re.IGNORECASE,
+)
+STYLE_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.DOTALL | re.IGNORECASE)
+
+def minify_html(html):
+    """Collapse insignificant whitespace and drop comments; pre/textarea/script kept as-is."""
+    parts = []
+    pos = 0
+    text = ""
+    block_before = True
+    for m in HTML_TOKEN_RE.finditer(html):
+        # Text on both sides of a dropped comment is collapsed as one run.
+        text += html[pos:m.start()]
+        pos = m.end()
+        token = m.group()
+        if token.startswith("<!--"):
+            continue
+        name = (m.group("raw") or m.group("tag") or "").lower()
+        block = name in BLOCK_TAGS
+        if text:
+            collapsed = " ".join(text.split())
+            lead = text[:1].isspace() and not block_before
+            trail = text[-1:].isspace() and not block
+            if collapsed:
+                collapsed = (" " if lead else "") + collapsed + (" " if trail else "")
+            elif lead and trail:
+                collapsed = " "
+            parts.append(collapsed)
+            text = ""
+        if name == "style":
+            token = STYLE_RE.sub(lambda s: s.group(1) + minify_css(s.group(2)) + s.group(3), token)
+        parts.append(token)
+        block_before = block
+    parts.append(" ".join((text + html[pos:]).split()))
+    return "".join(parts)
+
+# Text outputs a static host may serve pre-compressed.
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".ics", ".xml")
+COMPRESS_FORMATS = ("gz", "br")
+
+def compress(data, fmt):
+    if fmt == "gz":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+@dataclass(frozen=True)
+class OutputOptions:
+    """Post-processing applied to every staged file (--minify, --compress)."""
+    minify: bool = False
+    compress: tuple = ()
+
+def finish_file(name, text, options=None, log=None):
+    """Minify and pre-compress text per options; returns {name: bytes} for the file and its siblings."""
+    before = None
+    if options is not None and options.minify and name.endswith((".html", ".css")):
+        before = len(text.encode("utf-8"))
+        with stage("minify"):
+            text = minify_html(text) if name.endswith(".html") else minify_css(text)
+    data = text.encode("utf-8")
+    files = {name: data}
+    if options is not None and options.compress and name.endswith(COMPRESSIBLE):
+        with stage("compress"):
+            for fmt in options.compress:
+                files[f"{name}.{fmt}"] = compress(data, fmt)
+    if log is not None:
+        base = name.rsplit("/", 1)[-1]
+        if before is None and len(files) == 1:
+            log(f"  wrote {base}")
+        else:
+            detail = [f"{before:,} \u2192 {len(data):,} bytes" if before is not None else f"{len(data):,} bytes"]
+            detail += [f"{fmt} {len(files[f'{name}.{fmt}']):,}" for fmt in options.compress if f"{name}.{fmt}" in files]
+            log(f"  wrote {base} ({', '.join(detail)})")
+    return files
+
+def write_file(out, text, options=None, log=None):
+    """Finish text per options and write it (and its siblings) to the staging Path out.
+
+    For an in-memory build out is the output-relative name instead, and the
+    {rel: bytes} mapping is returned rather than written.
+    """
+    if not isinstance(out, Path):
+        return finish_file(out, text, options, log)
+    files = finish_file(out.name, text, options, log)
+    with stage("write"):
+        for name, data in files.items():
+            out.with_name(name).write_bytes(data)
+    return None
+
+class PageShell:
+    """HTML_TEMPLATE compiled for one build: static UTF-8 segments around the per-page slots.
+
+    The shared fields (styles, search, updated) are baked into the segments,
+    so a page costs three slot encodes instead of formatting the whole
+    document (inline CSS included). title and description are HTML-escaped;
+    body is inserted as-is.
+    """
+
+    SLOTS = ("title", "description", "body")
+
+    def __init__(self, styles, search, updated):
+        shared = {"styles": styles, "search": search, "updated": updated}
+        self.segments = []
+        self.slots = []
+        text = ""
+        for literal, name, _, _ in string.Formatter().parse(HTML_TEMPLATE):
+            text += literal
+            if name is None:
+                continue
+            if name in self.SLOTS:
+                self.segments.append(text.encode("utf-8"))
+                self.slots.append(name)
+                text = ""
+            else:
+                text += shared[name]
+        self.segments.append(text.encode("utf-8"))
+
+    def chunks(self, title, description, body_html):
+        """The page as a list of byte strings, ready for writelines()."""
+        values = {
+            "title": html.escape(title).encode("utf-8"),
+            "description": html.escape(description).encode("utf-8"),
+            "body": body_html.encode("utf-8"),
+        }
+        parts = [self.segments[0]]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            parts += (values[name], segment)
+        return parts
+
+@functools.lru_cache(maxsize=8)
+def page_shell(styles, search, updated):
+    """The compiled PageShell, once per process for each set of shared fields."""
+    return PageShell(styles, search, updated)
+
+def render_page(title, description, body_html, out, styles=None, search="", options=None,
+                updated=DEFAULT_EDITION.updated, log=print):
+    """Put a page body in the site template and stage it (see write_file() for out).
+
+    Without --minify or --compress the shell's segments are streamed straight
+    to the file with writelines(), so no full-document string is built.
+    """
+    shell = page_shell(styles if styles is not None else f"<style>{CSS}</style>", search, updated)
+    with stage("format"):
+        chunks = shell.chunks(title, description, body_html)
+    if options is not None and (options.minify or options.compress):
+        # Both work on the whole document, so join it once here.
+        return write_file(out, b"".join(chunks).decode("utf-8"), options, log)
+    with stage("write"):
+        if isinstance(out, Path):
+            with open(out, "wb") as f:
+                f.writelines(chunks)
+            files = None
+        else:
+            files = {out: b"".join(chunks)}
+    if log is not None:
+        log(f"  wrote {(out.name if isinstance(out, Path) else out).rsplit('/', 1)[-1]}")
+    return files
+
+# Single left-to-right scan: the regex engine skips plain text and plain tags
+# in C, and Python only sees comments, boundaries of elements whose text must
+# not be linkified, tags carrying URLs in attributes, and bare URLs.
+LINKIFY_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(?P<close>/?)(?P<skip>(?i:a|code|pre|script|style|textarea))\b[^>]*>"
+    r"|<[a-zA-Z][^>]*://[^>]*>"
+    r"|(?P<url>https?://[^\s<>\"')\]]+)",
+    re.DOTALL,
+)
 
 def linkify(html):
-    """Convert bare https?:// URLs in HTML text nodes to clickable <a> links."""
-    # Match URLs not already inside href="..." or src="..."
-    return re.sub(
-        r'(?<!href=")(?<!href=\')(?<!src=")(?<!src=\')(https?://[^\s<>"\')\]]+)',
-        r'<a href="\1" target="_blank" rel="noopener">\1</a>',
-        html,
-    )
+    """Convert bare https?:// URLs in HTML text nodes to clickable <a> links.
 
-def convert_md(src_path):
+    Tags, attributes and comments pass through untouched, as does text inside
+    an existing <a> (or code/pre), so already-linked URLs are never nested.
+    """
+    depth = 0
+
+    def replace(m):
+        nonlocal depth
+        url = m.group("url")
+        if url is None:
+            if m.group("skip") and not m.group().endswith("/>"):
+                depth = max(depth - 1, 0) if m.group("close") else depth + 1
+            return m.group()
+        if depth:
+            return url
+        return f'<a href="{url}" target="_blank" rel="noopener">{url}</a>'
+
+    return LINKIFY_RE.sub(replace, html)
+
+def convert_text(text):
     md_parser.reset()
-    text = src_path.read_text(encoding="utf-8")
     # Strip YAML frontmatter
-    text = re.sub(r"^---\n.*?\n---\n", "", text, flags=re.DOTALL)
-    html = md_parser.convert(text)
-    return linkify(html)
-
-# Ensure output dirs exist
-(OUT / "states").mkdir(parents=True, exist_ok=True)
-
-# Build state pages
-built = 0
-missing = []
-for slug, state_name, description in STATE_PAGES:
-    src = SRC / f"church-compliance-deadlines-{slug}-2026-draft.md"
-    if not src.exists():
-        print(f"  MISSING: {src.name}")
-        missing.append(slug)
-        continue
-    body = convert_md(src)
-    body = body.replace('<h2>Sources</h2>', '<div class="sources"><h2>Sources</h2>')
-    body += '</div>'
-    out = OUT / "states" / f"{slug}.html"
-    render_page(f"Church Compliance \u2014 {state_name}", description, body, out)
-    built += 1
-
-print(f"\nBuilt {built} state pages. Missing: {missing or 'none'}")
-
-# Build index
-index_src = SRC / "church-compliance-directory-index.md"
-index_body = convert_md(index_src)
-
-state_cards = '\n<div class="state-grid">\n'
-for slug, state_name, desc in STATE_PAGES:
-    state_cards += f'''<div class="state-card">
-  <h3>{state_name}</h3>
-  <p>{desc}</p>
-  <a href="states/{slug}.html">View {state_name} guide \u2192</a>
+    with stage("frontmatter"):
+        text = FRONTMATTER_RE.sub("", text, count=1)
+    with stage("convert"):
+        html = md_parser.convert(text)
+    with stage("linkify"):
+        return linkify(html)
+
+def convert_md(src_path):
+    return convert_text(src_path.read_text(encoding="utf-8"))
+
+def decode_source(raw):
+    """Decode source bytes the way Path.read_text would (universal newlines)."""
+    return raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+def parse_frontmatter(text):
+    """Return the YAML frontmatter at the top of text as a dict ({} if absent)."""
+    m = FRONTMATTER_RE.match(text)
+    if not m:
+        return {}
+    block = m.group(1)
+    if yaml is not None:
+        try:
+            meta = yaml.load(block, Loader=YAML_LOADER)
+        except yaml.YAMLError:
+            meta = None
+        return meta if isinstance(meta, dict) else {}
+    # Without PyYAML, read flat "key: value" lines, which is all our sources use.
+    meta = {}
+    for line in block.splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key and not key[0].isspace() and not key.startswith("#"):
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+                value = value[1:-1]
+            meta[key.strip()] = value
+    return meta
+
+def sha256_hex(*parts):
+    """Hash a sequence of str/bytes parts with unambiguous separators."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+def template_hash(styles, search_form="", options=None, updated=DEFAULT_EDITION.updated):
+    """Hash of everything shared by all pages: CSS, template, Markdown config, output options."""
+    return sha256_hex(CSS, styles, search_form, HTML_TEMPLATE, repr(MD_EXTENSIONS), markdown.__version__,
+                      str(LINKIFY_VERSION), str(SHELL_VERSION), repr(options or OutputOptions()), updated)
+
+def load_manifest(path):
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("pages", {})
+
+def save_manifest(path, pages):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps({"version": MANIFEST_VERSION, "pages": pages}, indent=1, sort_keys=True),
+        encoding="utf-8",
+    )
+    tmp.replace(path)
+
+def is_fresh(build, key):
+    return build.old.get(key) == build.new[key] and build.exists(key)
+
+def fragment_key(raw):
+    """Cache key for a source's rendered body: its bytes plus everything convert_text depends on."""
+    return sha256_hex(raw, repr(MD_EXTENSIONS), markdown.__version__, str(LINKIFY_VERSION))
+
+class FragmentCache:
+    """On-disk SQLite map of fragment_key -> rendered body HTML with LRU eviction.
+
+    Keys are content hashes, so one cache file can safely be shared between
+    branches, editions and checkouts. Once the stored HTML exceeds max_bytes,
+    the least recently used entries are dropped.
+    """
+
+    def __init__(self, path, max_bytes):
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # path None keeps the cache in memory for this run only. The preview
+        # server rebuilds on its request threads; PreviewApp's lock serialises that use.
+        self.db = sqlite3.connect(":memory:" if path is None else str(path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS fragments ("
+            " key TEXT PRIMARY KEY, html TEXT NOT NULL,"
+            " size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used)")
+
+    def get(self, key):
+        row = self.db.execute("SELECT html FROM fragments WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE fragments SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, html):
+        self.db.execute(
+            "INSERT OR REPLACE INTO fragments (key, html, size, used) VALUES (?, ?, ?, ?)",
+            (key, html, len(html.encode("utf-8")), time.time()),
+        )
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        dropped = 0
+        for key, size in self.db.execute("SELECT key, size FROM fragments ORDER BY used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM fragments WHERE key = ?", (key,))
+            total -= size
+            dropped += 1
+        return dropped
+
+    def close(self):
+        self.evict()
+        self.db.commit()
+        self.db.close()
+
+def cached_convert(build, raw):
+    """convert_text through the build's fragment cache, if it has one."""
+    if build.cache is None:
+        return convert_text(decode_source(raw))
+    key = fragment_key(raw)
+    body = build.cache.get(key)
+    if body is None:
+        body = convert_text(decode_source(raw))
+        build.cache.put(key, body)
+    return body
+
+def render_state_page(job):
+    """Render one state page; returns its log lines so the parent prints them in order.
+
+    A job carries either the cached body or the source text to convert; in the
+    latter case the fresh body is returned too so the parent can cache it.
+    With search enabled the page's index terms are returned as well, and with
+    the deadline dataset enabled its deadline records. For an in-memory build
+    (out is a relative name) the page's {rel: bytes} files come back too.
+    """
+    slug, state_name, description, text, cached_body, out, styles, search_form, data, options, updated = job
+    key = f"states/{slug}.html"
+    if profiler is not None:
+        profiler.start_page(key)
+    lines = []
+    body = convert_text(text) if cached_body is None else cached_body
+    fresh_body = body if cached_body is None else None
+    terms = None
+    if search_form:
+        with stage("search"):
+            terms = search.page_terms(state_name, body)
+    records = None
+    if data:
+        with stage("deadlines"):
+            records = deadlines.page_records(slug, state_name, body)
+    with stage("sources"):
+        body = body.replace('<h2>Sources</h2>', '<div class="sources"><h2>Sources</h2>')
+        body += '</div>'
+    files = render_page(f"Church Compliance \u2014 {state_name}", description, body, out,
+                        styles=styles, search=search_form, options=options, updated=updated,
+                        log=lines.append)
+    stats = profiler.take(key) if profiler is not None else None
+    return lines, fresh_body, stats, terms, records, files
+
+shared_pool = None
+
+def new_pool(workers):
+    profile = None if profiler is None else profiler.memory
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(profile,))
+
+@contextlib.contextmanager
+def worker_pool(workers):
+    """Keep one process pool open for every run_jobs() call in the block (used across editions)."""
+    global shared_pool
+    if workers <= 1:
+        yield
+        return
+    with new_pool(workers) as pool:
+        shared_pool = pool
+        try:
+            yield
+        finally:
+            shared_pool = None
+
+def run_jobs(fn, jobs, workers):
+    """Yield fn(job) for each job in order, using a process pool when workers > 1."""
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(fn, jobs)
+        return
+    chunksize = max(1, len(jobs) // (workers * 4))
+    if shared_pool is not None:
+        yield from shared_pool.map(fn, jobs, chunksize=chunksize)
+        return
+    with new_pool(workers) as pool:
+        yield from pool.map(fn, jobs, chunksize=chunksize)
+
+@dataclass
+class Build:
+    """Settings and manifest state shared by one build (or one watch session)."""
+    src_dir: Path
+    out_dir: Path
+    styles: str
+    base_hash: str
+    old: dict = field(default_factory=dict)
+    new: dict = field(default_factory=dict)
+    force: bool = False
+    workers: int = 1
+    cache: FragmentCache = None
+    pages: dict = field(default_factory=dict)
+    stage_dir: Path = None
+    # In-memory builds keep their output in files ({rel: bytes}) and stage into staged.
+    files: dict = None
+    staged: dict = None
+    search_index: search.SearchStore = None
+    search_form: str = ""
+    deadline_store: deadlines.DeadlineStore = None
+    change_store: sitemap.ChangeStore = None
+    site_url: str = ""
+    options: OutputOptions = field(default_factory=OutputOptions)
+    edition: Edition = DEFAULT_EDITION
+    updated: str = DEFAULT_EDITION.updated
+    validate: bool = True
+
+    @property
+    def state_dir(self):
+        """Manifest, stores and delta of this output root (one directory per root, so editions never share)."""
+        return state_dir(self.out_dir)
+
+    @property
+    def manifest_path(self):
+        return self.state_dir / "manifest.json"
+
+    def output(self, rel):
+        """Staging path for an output file; commit_output() moves it into out_dir.
+
+        An in-memory build has no staging directory, so rel itself is returned
+        and write_file() hands the bytes back instead of writing them.
+        """
+        if self.files is not None:
+            return rel
+        path = self.stage_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def write(self, rel, text):
+        """Record rel in the manifest and stage it (minified/compressed per options)."""
+        self.new[rel] = sha256_hex(text)
+        self.staged.update(write_file(self.output(rel), text, self.options) or {})
+
+    def render(self, rel, title, description, body_html):
+        """Stage one page in the site template."""
+        files = render_page(title, description, body_html, self.output(rel), styles=self.styles,
+                            search=self.search_form, options=self.options, updated=self.updated)
+        self.staged.update(files or {})
+
+    def exists(self, rel):
+        """Whether rel is in the current (committed) output."""
+        if self.files is not None:
+            return rel in self.files
+        return (self.out_dir / rel).exists()
+
+    def size(self, rel):
+        """Byte size of rel as it will be after commit_output()."""
+        if self.files is not None:
+            return len(self.staged.get(rel, self.files.get(rel, b"")))
+        path = self.stage_dir / rel
+        return (path if path.exists() else self.out_dir / rel).stat().st_size
+
+def begin_output(build):
+    """Start a fresh staging directory next to out_dir (same filesystem, so renames are atomic)."""
+    build.staged = {}
+    if build.files is not None:
+        return
+    build.out_dir.mkdir(parents=True, exist_ok=True)
+    build.stage_dir = Path(tempfile.mkdtemp(prefix=".staging-", dir=build.out_dir.parent))
+
+def discard_output(build):
+    build.staged = None
+    if build.stage_dir is not None:
+        shutil.rmtree(build.stage_dir, ignore_errors=True)
+        build.stage_dir = None
+
+def commit_output(build):
+    """Move staged files whose bytes differ into out_dir and delete dropped outputs.
+
+    Runs only after every page rendered, so a failed build leaves out_dir
+    untouched. Each file is swapped in with os.replace, so readers never see
+    a half-written page, and identical files keep their mtime. Returns the
+    delta as {"added": [...], "changed": [...], "deleted": [...], "unchanged": n}.
+    """
+    delta = {"added": [], "changed": [], "deleted": [], "unchanged": 0}
+    if build.files is not None:
+        return commit_memory_output(build, delta)
+    for dirpath, _, filenames in os.walk(build.stage_dir):
+        for name in filenames:
+            staged = Path(dirpath) / name
+            rel = staged.relative_to(build.stage_dir).as_posix()
+            target = build.out_dir / rel
+            if target.exists():
+                if filecmp.cmp(staged, target, shallow=False):
+                    delta["unchanged"] += 1
+                    continue
+                delta["changed"].append(rel)
+            else:
+                delta["added"].append(rel)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, target)
+    # Only paths a previous build produced are ever deleted.
+    for rel in sorted(build.old):
+        target = build.out_dir / rel
+        if rel not in build.new and target.is_file():
+            target.unlink()
+            delta["deleted"].append(rel)
+            if target.parent != build.out_dir and not any(target.parent.iterdir()):
+                target.parent.rmdir()
+    delta["added"].sort()
+    delta["changed"].sort()
+    discard_output(build)
+    return delta
+
+def track_compressed(build):
+    """Give every compressible output's .gz/.br siblings their own manifest entries.
+
+    Siblings from a build with other --compress formats are dropped, so
+    commit_output() deletes their files.
+    """
+    for rel in list(build.new):
+        if rel.endswith(tuple(f".{fmt}" for fmt in COMPRESS_FORMATS)):
+            del build.new[rel]
+    for rel in list(build.new):
+        if rel.endswith(COMPRESSIBLE):
+            for fmt in build.options.compress:
+                build.new[f"{rel}.{fmt}"] = build.new[rel]
+
+def check_budget(build, budget_kb):
+    """Print every HTML page over budget_kb (staged or kept from earlier); returns how many."""
+    budget = int(budget_kb * 1024)
+    over = 0
+    for rel in sorted(build.new):
+        if not rel.endswith(".html"):
+            continue
+        size = build.size(rel)
+        if size > budget:
+            print(f"  OVER BUDGET: {rel} is {size:,} bytes (budget {budget:,})")
+            over += 1
+    return over
+
+def commit_memory_output(build, delta):
+    """commit_output() for an in-memory build: swap staged bytes into build.files."""
+    for rel, data in sorted(build.staged.items()):
+        current = build.files.get(rel)
+        if current == data:
+            delta["unchanged"] += 1
+            continue
+        delta["changed" if current is not None else "added"].append(rel)
+        build.files[rel] = data
+    for rel in sorted(build.old):
+        if rel not in build.new and build.files.pop(rel, None) is not None:
+            delta["deleted"].append(rel)
+    discard_output(build)
+    return delta
+
+def write_delta(path, delta):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(delta, indent=1) + "\n", encoding="utf-8")
+
+def source_name(slug, edition=DEFAULT_EDITION):
+    return f"church-compliance-deadlines-{slug}-{edition.suffix}.md"
+
+class Page:
+    """A source page found by discover_pages(); the file is read on first use.
+
+    Display name and meta description come from the frontmatter ("name" or
+    "state", and "description"), falling back to STATE_PAGES for the states.
+    "region" picks the landing page the card is listed on at scale.
+    """
+
+    def __init__(self, slug, path):
+        self.slug = slug
+        self.path = path
+
+    @functools.cached_property
+    def raw(self):
+        return self.path.read_bytes()
+
+    @functools.cached_property
+    def meta(self):
+        return parse_frontmatter(decode_source(self.raw))
+
+    @property
+    def name(self):
+        meta = self.meta
+        fallback = STATE_META.get(self.slug, (self.slug.replace("-", " ").title(), ""))
+        return str(meta.get("name") or meta.get("state") or fallback[0])
+
+    @property
+    def description(self):
+        fallback = STATE_META.get(self.slug, (None, ""))
+        return str(self.meta.get("description") or fallback[1])
+
+    @property
+    def region(self):
+        return str(self.meta.get("region") or REGION_OF.get(self.slug, "Other"))
+
+    @property
+    def entry(self):
+        return (self.slug, self.name, self.description)
+
+def discover_pages(src_dir, only=None, edition=DEFAULT_EDITION):
+    """List source pages with one os.scandir pass, sorted by slug.
+
+    Only file names are examined here; frontmatter is read lazily by Page,
+    so a build restricted to `only` slugs never opens the other sources.
+    """
+    pages = []
+    source_re = edition.source_re
+    with os.scandir(src_dir) as entries:
+        for entry in entries:
+            m = source_re.fullmatch(entry.name)
+            if m and (only is None or m.group("slug") in only):
+                pages.append(Page(m.group("slug"), Path(entry.path)))
+    pages.sort(key=lambda page: page.slug)
+    return pages
+
+# Frontmatter keys with a meaning here and the types they must have; other keys are ignored.
+FRONTMATTER_SCHEMA = {
+    "title": str, "slug": str, "name": str, "state": str,
+    "description": str, "region": str, "status": str,
+}
+FENCE_RE = re.compile(r"^\s{0,3}(```|~~~)")
+TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+H2_RE = re.compile(r"^##\s+(.*?)\s*#*\s*$")
+
+class ValidationError(Exception):
+    """Raised with the list of problems when sources fail validate_pages()."""
+
+    def __init__(self, problems):
+        super().__init__(f"{len(problems)} validation problem(s)")
+        self.problems = problems
+
+def table_cells(line):
+    """Cell count of a markdown table row: pipes inside backticks or escaped with \\ do not split."""
+    row = line.strip()
+    cells = 1
+    code = False
+    escaped = False
+    for i, ch in enumerate(row):
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == "`":
+            code = not code
+        elif ch == "|" and not code and 0 < i < len(row) - 1:
+            cells += 1
+    return cells
+
+def check_source(page):
+    """Read and check one source; returns [(line, message)].
+
+    Runs in validate_pages()' thread pool. The bytes and frontmatter it reads
+    are stored on the Page, so the render stage does not read them again.
+    """
+    raw = page.raw
+    try:
+        text = decode_source(raw)
+    except UnicodeDecodeError as exc:
+        # Keeps the cross-page checks (page.meta, .name, .region) from decoding it again.
+        page.__dict__["meta"] = {}
+        return [(0, f"not valid UTF-8 ({exc.reason} at byte {exc.start})")]
+    problems = []
+    body_start = 0
+    if text.startswith("---\n"):
+        m = FRONTMATTER_RE.match(text)
+        if not m:
+            problems.append((1, "frontmatter block is not closed with a --- line"))
+        else:
+            body_start = m.group(0).count("\n")
+            if yaml is None:
+                meta = parse_frontmatter(text)
+            else:
+                # Same result as parse_frontmatter(), but keeping the error to report.
+                try:
+                    meta = yaml.load(m.group(1), Loader=YAML_LOADER)
+                except yaml.YAMLError as exc:
+                    mark = getattr(exc, "problem_mark", None)
+                    line = mark.line + 2 if mark is not None else 1
+                    problems.append((line, f"frontmatter is not valid YAML ({getattr(exc, 'problem', exc)})"))
+                    meta = {}
+                if not isinstance(meta, dict):
+                    if meta is not None:
+                        problems.append((2, "frontmatter must be a mapping of key: value lines"))
+                    meta = {}
+            for key, kind in FRONTMATTER_SCHEMA.items():
+                if key in meta and not isinstance(meta[key], kind):
+                    problems.append((2, f"frontmatter {key!r} must be a {kind.__name__}, "
+                                        f"not {type(meta[key]).__name__}"))
+            if isinstance(meta.get("slug"), str) and meta["slug"] != page.slug:
+                problems.append((2, f"frontmatter slug {meta['slug']!r} does not match the file name slug "
+                                    f"{page.slug!r}"))
+            page.__dict__["meta"] = meta
+    if page.slug not in STATE_META:
+        meta = page.meta
+        if not (meta.get("name") or meta.get("state")):
+            problems.append((1, "frontmatter needs a name (or state) for a page that is not a state guide"))
+        if not meta.get("description"):
+            problems.append((1, "frontmatter needs a description for a page that is not a state guide"))
+
+    lines = text.split("\n")
+    sources = []
+    fence = None
+    i = body_start
+    while i < len(lines):
+        line = lines[i]
+        m = FENCE_RE.match(line)
+        if m:
+            fence = None if fence == m.group(1) else fence or m.group(1)
+        elif fence is None:
+            h2 = H2_RE.match(line)
+            if h2 and h2.group(1) == "Sources":
+                sources.append(i + 1)
+            elif ("|" in line and i + 1 < len(lines) and "|" in lines[i + 1]
+                    and TABLE_SEPARATOR_RE.match(lines[i + 1])):
+                columns = table_cells(line)
+                if table_cells(lines[i + 1]) != columns:
+                    problems.append((i + 2, f"table separator has {table_cells(lines[i + 1])} cells, "
+                                            f"header has {columns}"))
+                i += 2
+                while i < len(lines) and lines[i].strip() and "|" in lines[i]:
+                    cells = table_cells(lines[i])
+                    if cells != columns:
+                        problems.append((i + 1, f"table row has {cells} cells, header has {columns}"))
+                    i += 1
+                continue
+        i += 1
+    if fence is not None:
+        problems.append((len(lines), f"code fence {fence} is never closed"))
+    if not sources:
+        problems.append((0, "no \"## Sources\" section (every guide ends with one)"))
+    elif len(sources) > 1:
+        problems.append((sources[1], f"second \"## Sources\" section (first on line {sources[0]})"))
+    return problems
+
+def validate_pages(pages, expected=(), edition=DEFAULT_EDITION, others=()):
+    """Check every source before anything is rendered; raises ValidationError.
+
+    Files are read and checked in a thread pool sized for I/O (the
+    executor's default, min(32, CPUs + 4)), independent of --jobs; the work
+    is mostly reads and a line scan, a few milliseconds per page. Cross-page
+    checks follow: expected slugs that have no source, and pages that would
+    collide on slug or region landing page, or share a display name within
+    one region (two "Washington County" cards in different regions are
+    fine; two on one region page cannot be told apart). others are pages already
+    checked (the rest of the site during rebuild()) that only take part in
+    the cross-page checks.
+    """
+    problems = []
+    if len(pages) > 1:
+        with ThreadPoolExecutor() as pool:
+            results = list(pool.map(check_source, pages))
+    else:
+        results = [check_source(page) for page in pages]
+    for page, page_problems in zip(pages, results):
+        problems += [(page.path.name, line, message) for line, message in page_problems]
+
+    for slug in sorted(set(expected) - {page.slug for page in pages}):
+        problems.append((source_name(slug, edition), 0, "missing source"))
+    slugs = {page.slug for page in pages}
+    seen = {"slug": {}, "name": {}}
+    regions = {}
+    for page in [*(page for page in others if page.slug not in slugs), *pages]:
+        meta_slug = page.meta.get("slug") if isinstance(page.meta.get("slug"), str) else page.slug
+        first = seen["slug"].setdefault(meta_slug, page)
+        if first is not page:
+            problems.append((page.path.name, 0, f"duplicate slug {meta_slug!r} (also {first.path.name})"))
+        first = seen["name"].setdefault((page.name, page.region), page)
+        if first is not page:
+            problems.append((page.path.name, 0, f"duplicate name {page.name!r} in region {page.region!r} "
+                                                f"(also {first.path.name})"))
+        # Differently spelled regions must not share a landing page.
+        first = regions.setdefault(region_slug(page.region), page)
+        if first.region != page.region:
+            problems.append((page.path.name, 0, f"region {page.region!r} and {first.region!r} "
+                                                f"({first.path.name}) share regions/{region_slug(page.region)}/"))
+    if problems:
+        raise ValidationError(problems)
+
+def report_problems(problems):
+    for name, line, message in problems:
+        print(f"  INVALID: {name}{f':{line}' if line else ''}: {message}")
+
+@contextlib.contextmanager
+def exit_on_invalid():
+    """Turn a ValidationError from a command into its report and exit status 1."""
+    try:
+        yield
+    except ValidationError as exc:
+        report_problems(exc.problems)
+        raise SystemExit(f"error: {exc} in the sources; nothing was built") from None
+
+def build_state_pages(build, pages):
+    """Render every state page whose inputs changed; returns (built, skipped)."""
+    jobs = []
+    frag_keys = []
+    skipped = 0
+    for page in pages:
+        key = f"states/{page.slug}.html"
+        if profiler is not None:
+            profiler.start_page(key)
+        with stage("read"):
+            raw = page.raw
+        slug, state_name, description = entry = page.entry
+        build.new[key] = sha256_hex(build.base_hash, raw, repr(entry))
+        note_change(build, key, raw, repr(entry), title=f"Church Compliance \u2014 {state_name}",
+                    summary=description)
+        if (not build.force and is_fresh(build, key)
+                and (build.search_index is None or key in build.search_index)
+                and (build.deadline_store is None or key in build.deadline_store)):
+            skipped += 1
+            continue
+        frag_key = cached_body = None
+        if build.cache is not None:
+            frag_key = fragment_key(raw)
+            cached_body = build.cache.get(frag_key)
+        text = decode_source(raw) if cached_body is None else None
+        jobs.append((slug, state_name, description, text, cached_body, build.output(key),
+                     build.styles, build.search_form, build.deadline_store is not None, build.options,
+                     build.updated))
+        frag_keys.append(frag_key)
+
+    results = run_jobs(render_state_page, jobs, build.workers)
+    for job, frag_key, (lines, fresh_body, stats, terms, records, files) in zip(jobs, frag_keys, results):
+        for line in lines:
+            print(line)
+        if terms is not None:
+            slug, state_name, description = job[:3]
+            build.search_index.put(f"states/{slug}.html", f"/states/{slug}.html",
+                                   state_name, description, terms)
+        if records is not None:
+            build.deadline_store.put(f"states/{job[0]}.html", records)
+        if files:
+            build.staged.update(files)
+        if frag_key is not None and fresh_body is not None:
+            build.cache.put(frag_key, fresh_body)
+        if stats:
+            profiler.merge(f"states/{job[0]}.html", stats)
+    return len(jobs), skipped
+
+def escape_card(value):
+    """Escape frontmatter text for listing markup exactly as LAZY_CARDS_JS's esc() does."""
+    return html.escape(value, quote=False).replace('"', "&quot;")
+
+def render_state_cards(entries, prefix="states/", grid_id=""):
+    """The index's state-grid markup for (slug, name, description) entries."""
+    cards = [
+        f'''<div class="state-card">
+  <h3>{escape_card(state_name)}</h3>
+  <p>{escape_card(desc)}</p>
+  <a href="{prefix}{slug}.html">View {escape_card(state_name)} guide \u2192</a>
 </div>\n'''
-state_cards += '</div>\n'
-
-index_body = re.sub(
-    r'<table>.*?</table>',
-    state_cards,
-    index_body,
-    count=1,
-    flags=re.DOTALL
-)
+        for slug, state_name, desc in entries
+    ]
+    open_tag = f'<div class="state-grid" id="{grid_id}">' if grid_id else '<div class="state-grid">'
+    return f'\n{open_tag}\n' + "".join(cards) + '</div>\n'
 
-render_page(
-    "Church Compliance Directory",
-    "State-by-state compliance guides for churches \u2014 official government links, no legal advice.",
-    index_body,
-    OUT / "index.html"
-)
+def splice_first_table(html, replacement):
+    """Replace the first <table>...</table> in html (the markdown list of guides)."""
+    start = html.find("<table>")
+    end = html.find("</table>", start)
+    if start < 0 or end < 0:
+        return html
+    return html[:start] + replacement + html[end + len("</table>"):]
+
+def region_slug(region):
+    return re.sub(r"[^a-z0-9]+", "-", region.lower()).strip("-") or "other"
+
+def listing_name(group, n):
+    """File name of page n of a listing group ("index" or "regions/<slug>")."""
+    return f"{group}.html" if n == 1 else f"{group}-{n}.html"
+
+def render_pager(group, n, count):
+    base = group.rsplit("/", 1)[-1]
+    links = []
+    for i in range(1, count + 1):
+        name = listing_name(base, i)
+        links.append(f"<strong>{i}</strong>" if i == n else f'<a href="{name}">{i}</a>')
+    return '<p class="pager" id="pager">Page ' + " ".join(links) + '</p>\n'
+
+def write_listing(build, group, title, description, heading, entries, prefix):
+    """Stage a paginated card listing; returns the grid markup for its first page.
+
+    Pages after the first get their own HTML file (for crawlers and no-JS
+    visitors) and a cards/<group>/<n>.json chunk that LAZY_CARDS_JS appends
+    to the grid as the visitor scrolls. Listings that fit on one page produce
+    the plain grid, exactly as before pagination existed.
+    """
+    chunks = [entries[i:i + CARDS_PER_PAGE] for i in range(0, len(entries), CARDS_PER_PAGE)] or [[]]
+    if len(chunks) == 1:
+        return render_state_cards(entries, prefix)
+    first = None
+    for n, chunk in enumerate(chunks, 1):
+        next_chunk = f"/cards/{group}/{n + 1}.json" if n < len(chunks) else ""
+        grid = (render_state_cards(chunk, prefix, grid_id="cards")
+                + f'<div id="more-cards" data-next="{next_chunk}"></div>\n'
+                + render_pager(group, n, len(chunks))
+                + LAZY_CARDS_JS)
+        if n == 1:
+            first = grid
+        else:
+            rel = listing_name(group, n)
+            build.new[rel] = sha256_hex(build.base_hash, heading, repr(chunk), str(len(chunks)), str(CARDS_VERSION))
+            note_change(build, rel, heading, repr(chunk), str(len(chunks)))
+            build.render(rel, f"{title} \u2014 page {n}", description, heading + grid)
+            rel = f"cards/{group}/{n}.json"
+            data = json.dumps({
+                "cards": [[f"/states/{slug}.html", name, desc] for slug, name, desc in chunk],
+                "next": next_chunk or None,
+            }, separators=(",", ":"), ensure_ascii=False)
+            build.write(rel, data)
+    return first
+
+def build_index(build, pages):
+    """Render the index (and, at scale, its paginated and per-region listings).
+
+    Everything here is cheap string assembly, so the whole listing set is
+    rebuilt when the index markdown or any page's card metadata changes;
+    the staged output then writes only the files whose bytes differ.
+    """
+    index_src = build.src_dir / INDEX_SRC_NAME
+    if profiler is not None:
+        profiler.start_page("index.html")
+    with stage("read"):
+        raw = index_src.read_bytes()
+    entries = [page.entry for page in pages]
+    regions = [page.region for page in pages]
+    key = "index.html"
+    listing_keys = [rel for rel in build.old if rel.startswith(LISTING_PREFIXES)]
+    build.new[key] = sha256_hex(build.base_hash, raw, repr(entries), repr(regions), str(CARDS_PER_PAGE),
+                                str(CARDS_VERSION))
+    note_change(build, key, raw, repr(entries), repr(regions), str(CARDS_PER_PAGE))
+    if not build.force and is_fresh(build, key):
+        for rel in listing_keys:
+            build.new[rel] = build.old[rel]
+        print("  index.html unchanged")
+        return False
+    for rel in list(build.new):
+        if rel.startswith(LISTING_PREFIXES):
+            del build.new[rel]
+
+    index_body = cached_convert(build, raw)
+    title = "Church Compliance Directory"
+    description = "State-by-state compliance guides for churches \u2014 official government links, no legal advice."
+
+    region_nav = ""
+    if len(entries) > CARDS_PER_PAGE:
+        by_region = {}
+        for page in pages:
+            by_region.setdefault(page.region, []).append(page.entry)
+        if len(by_region) > 1:
+            region_nav = '<ul class="regions">\n' + "".join(
+                f'<li><a href="regions/{region_slug(region)}.html">{escape_card(region)}</a> ({len(members)})</li>\n'
+                for region, members in sorted(by_region.items())
+            ) + '</ul>\n'
+            for region, members in sorted(by_region.items()):
+                group = f"regions/{region_slug(region)}"
+                heading = f"<h1>Church Compliance \u2014 {escape_card(region)}</h1>\n"
+                grid = write_listing(build, group, f"Church Compliance \u2014 {region}",
+                                     f"Church compliance guides for {region}.", heading, members, "../states/")
+                rel = listing_name(group, 1)
+                build.new[rel] = sha256_hex(build.base_hash, heading, repr(members), str(CARDS_VERSION))
+                note_change(build, rel, heading, repr(members))
+                build.render(rel, f"Church Compliance \u2014 {region}", f"Church compliance guides for {region}.",
+                             heading + grid)
+
+    heading = f"<h1>{title}</h1>\n{region_nav}"
+    state_cards = write_listing(build, "index", title, description, heading, entries, "states/")
+    index_body = splice_first_table(index_body, region_nav + state_cards)
+
+    build.render(key, title, description, index_body)
+    return True
+
+def generated_fresh(build, hashes, *parts):
+    """Whether OUT holds every file in hashes ({rel: text hash}) as the last build left it."""
+    return bool(hashes) and all(build.old.get(rel) == sha256_hex(build.base_hash, *parts, text_hash)
+                                and build.exists(rel) for rel, text_hash in hashes.items())
+
+def stage_generated(build, prefix, files, hashes, *parts):
+    """Stage regenerated files and give every current file under prefix its manifest entry.
+
+    The entry hashes the file's text hash with base_hash, so files kept from
+    the last build stay fresh until their content or an output option changes.
+    """
+    for rel in list(build.new):
+        if rel.startswith(prefix) and rel not in hashes:
+            del build.new[rel]
+    for rel, text in files.items():
+        build.write(rel, text)
+    for rel, text_hash in hashes.items():
+        build.new[rel] = sha256_hex(build.base_hash, *parts, text_hash)
+    return len(files)
+
+def write_search_index(build):
+    """Stage the search/ shards and doc blocks whose pages changed since the last build."""
+    store = build.search_index
+    everything = build.force or not generated_fresh(build, store.hashes)
+    store.retain({key for key in build.new if key.startswith("states/")})
+    files = search.index_files(store, everything)
+    return stage_generated(build, "search/", files, store.hashes)
+
+def write_deadline_data(build):
+    """Stage the data/ dataset and indexes, and the ICS feeds of pages whose records changed."""
+    store = build.deadline_store
+    year = str(build.edition.year)
+    everything = build.force or not generated_fresh(build, store.hashes, year)
+    store.retain({key for key in build.new if key.startswith("states/")})
+    files = deadlines.dataset_files(store, build.edition.year, everything)
+    return stage_generated(build, "data/", files, store.hashes, year)
+
+def note_change(build, rel, *parts, title=None, summary=None):
+    """Date rel for the sitemap/feed by a hash of its content inputs (when --site-url is on).
+
+    base_hash is left out on purpose: a template, CSS or output-option
+    change rewrites every page but is not news to crawlers or subscribers.
+    """
+    if build.change_store is not None:
+        build.change_store.note(rel, sha256_hex(*parts), int(time.time()), title, summary)
+
+def write_site_files(build):
+    """Stage sitemap.xml (sharded when large) and feed.xml for every HTML page in the manifest."""
+    pages = {rel for rel in build.new if rel.endswith(".html")}
+    for rel in pages:
+        # Listings kept from an earlier build that had no change store yet.
+        if rel not in build.change_store:
+            build.change_store.note(rel, build.new[rel], int(time.time()))
+    build.change_store.retain(pages)
+    files = sitemap.site_files(build.change_store, build.site_url,
+                               "Church Compliance Directory \u2014 updated guides", "Compliance Tracker")
+    for rel in list(build.new):
+        if rel.startswith("sitemaps/") and rel not in files:
+            del build.new[rel]
+    for rel, text in files.items():
+        build.write(rel, text)
+    return len(files)
+
+def save_state(build):
+    """Persist the manifest, search/deadline/change stores and fragment cache after a commit."""
+    if build.files is None:
+        save_manifest(build.manifest_path, build.new)
+    if build.search_index is not None:
+        build.search_index.save()
+    if build.deadline_store is not None:
+        build.deadline_store.save()
+    if build.change_store is not None:
+        build.change_store.save()
+    if build.cache is not None:
+        build.cache.db.commit()
+
+def edition_updated(edition):
+    """Footer date for an edition (its updated setting, which must be given)."""
+    if edition.updated is None:
+        raise ValueError(f"edition {edition.suffix} needs an updated date (--edition {edition.suffix},updated=TEXT)")
+    return edition.updated
+
+def state_dir(out_dir):
+    """.build-cache/<OUT name> next to out_dir: build state that belongs to that output root only."""
+    return out_dir.parent / ".build-cache" / out_dir.name
+
+def build_site(args, files=None, edition=DEFAULT_EDITION, cache=None):
+    """Run one incremental build of the whole site; returns the Build for reuse.
+
+    With files (a dict, usually empty) the site is built in memory instead:
+    output goes to files as {path: bytes} and nothing is written under OUT,
+    the manifest lives on the Build, and the fragment cache is only used if
+    args.cache names one explicitly. A cache passed in (build_editions()
+    shares one) is used as-is.
+    """
+    out_dir = args.out
+    styles = page_styles(args.css)
+    search_form = search.SEARCH_FORM if args.search else ""
+    options = OutputOptions(minify=args.minify, compress=tuple(args.compress or ()))
+    updated = edition_updated(edition)
+    only = set(args.only) if args.only else None
+    pages = discover_pages(args.src, only, edition)
+    expected = only if only is not None else STATE_META
+    if not args.no_validate:
+        # Before anything is opened or staged, so a bad source leaves OUT untouched.
+        # It reads every source (Page.raw keeps the bytes), so "read" time shows up here.
+        site_stages()
+        with stage("validate"):
+            validate_pages(pages, () if args.allow_missing else expected, edition)
+    build = Build(
+        src_dir=args.src,
+        out_dir=out_dir,
+        styles=styles,
+        search_form=search_form,
+        options=options,
+        edition=edition,
+        updated=updated,
+        base_hash=template_hash(styles, search_form, options, updated),
+        force=args.force,
+        workers=args.jobs or os.cpu_count() or 1,
+        validate=not args.no_validate,
+    )
+    build.files = files
+    on_disk = files is None
+    if on_disk:
+        build.old = load_manifest(build.manifest_path)
+    if args.only:
+        # A partial build keeps the manifest entries of pages it did not touch.
+        build.new = dict(build.old)
+    if cache is not None:
+        build.cache = cache
+    elif not args.no_cache and (on_disk or args.cache):
+        cache_path = args.cache or out_dir.parent / ".build-cache" / "fragments.sqlite"
+        build.cache = FragmentCache(cache_path, args.cache_size * 1024 * 1024)
+    if args.search:
+        build.search_index = search.SearchStore(build.manifest_path.with_name("search.json") if on_disk else None)
+    if args.data:
+        build.deadline_store = deadlines.DeadlineStore(
+            build.manifest_path.with_name("deadlines.json") if on_disk else None)
+    if args.site_url:
+        build.site_url = args.site_url
+        build.change_store = sitemap.ChangeStore(build.manifest_path.with_name("changes.json") if on_disk else None)
+        if on_disk and not build.change_store.pages:
+            # No history in .build-cache (a fresh clone): keep the dates already published.
+            build.change_store.seed(sitemap.published_lastmods(out_dir, build.site_url))
+
+    # A shared cache keeps counting across editions; report this build's share.
+    hits, misses = (build.cache.hits, build.cache.misses) if build.cache is not None else (0, 0)
+    begin_output(build)
+    try:
+        found = {page.slug for page in pages}
+        missing = [slug for slug in sorted(expected) if slug not in found]
+        for slug in missing:
+            print(f"  MISSING: {source_name(slug, build.edition)}")
+
+        site_stages()
+        if args.css != "inline":
+            build.write(css_asset_path(), CSS)
+
+        built, skipped = build_state_pages(build, pages)
+        print(f"\nBuilt {built} state pages ({skipped} unchanged). Missing: {missing or 'none'}")
+
+        if only is None:
+            build_index(build, pages)
+        else:
+            print("  index.html skipped (--only build)")
+
+        site_stages()
+        if build.search_index is not None:
+            print(f"  staged {write_search_index(build)} search index files")
+        if build.deadline_store is not None:
+            print(f"  staged {write_deadline_data(build)} deadline data files")
+        if build.change_store is not None:
+            print(f"  staged {write_site_files(build)} sitemap/feed files")
+        track_compressed(build)
+        if args.budget and check_budget(build, args.budget):
+            raise SystemExit(f"error: pages over the {args.budget:g} KB size budget; output left unchanged")
+    except BaseException:
+        discard_output(build)
+        raise
+
+    delta = commit_output(build)
+    if on_disk:
+        write_delta(args.delta or build.manifest_path.with_name("delta.json"), delta)
+    print(f"Output: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+          f"{len(delta['deleted'])} deleted, {delta['unchanged']} identical.")
+
+    if on_disk:
+        config = out_dir.parent / "_config.yml"
+        if not config.exists() or config.read_text() != "theme: null\n":
+            config.write_text("theme: null\n")
+    save_state(build)
+    if build.cache is not None:
+        print(f"Fragment cache: {build.cache.hits - hits} hits, {build.cache.misses - misses} misses.")
+    print("Build complete.")
+    build.pages = {page.slug: page for page in pages}
+    return build
+
+def build_editions(args):
+    """Build every --edition into its own output root; returns their Builds.
+
+    The editions are built one after another but share one worker pool and
+    one fragment cache (an in-memory one under --no-cache), so a page whose
+    source is identical in two editions is converted once, and the index
+    source common to all of them is parsed once.
+    """
+    editions = args.edition or [DEFAULT_EDITION]
+    if len(editions) == 1:
+        edition = editions[0]
+        if edition.out is not None:
+            args = argparse.Namespace(**{**vars(args), "out": edition.out})
+        return [build_site(args, edition=edition)]
+
+    roots = [edition.out or args.out.parent / edition.suffix / args.out.name for edition in editions]
+    seen = {}
+    for edition, out in zip(editions, roots):
+        other = seen.setdefault(state_dir(out).resolve(), edition)
+        if other is not edition:
+            raise SystemExit(f"error: editions {other.suffix} and {edition.suffix} would share the output root "
+                             f"and build state of {out}; give each its own out=DIR")
+    if args.no_cache:
+        cache = FragmentCache(None, args.cache_size * 1024 * 1024)
+    else:
+        # Shared by every edition, so it goes next to their common ancestor rather than next to OUT.
+        common = Path(os.path.commonpath([out.resolve().parent for out in roots]))
+        cache = FragmentCache(args.cache or common / ".build-cache" / "fragments.sqlite",
+                              args.cache_size * 1024 * 1024)
+    builds = []
+    with worker_pool(args.jobs or os.cpu_count() or 1):
+        for edition, out in zip(editions, roots):
+            print(f"\n== Edition {edition.suffix} \u2192 {out}")
+            # Each edition keeps its manifest, stores and delta in its own state_dir().
+            edition_args = argparse.Namespace(**{**vars(args), "out": out, "delta": None})
+            builds.append(build_site(edition_args, edition=edition, cache=cache))
+    return builds
+
+def build_in_memory(src_dir, **options):
+    """Build the site from src_dir into memory; returns the Build (build.files is {path: bytes}).
+
+    options are the command-line options by their argparse names, e.g.
+    css="external", search=True, minify=True, compress=["gz"], jobs=4.
+    Pass the Build to rebuild() or PreviewApp to keep it current.
+    """
+    args = parse_args([])
+    unknown = sorted(set(options) - set(vars(args)))
+    if unknown:
+        raise TypeError(f"unknown build options: {', '.join(unknown)}")
+    vars(args).update(options, src=Path(src_dir))
+    if "br" in (args.compress or ()) and brotli is None:
+        raise RuntimeError("compress=['br'] needs the brotli package")
+    return build_site(args, files={}, edition=(args.edition or [DEFAULT_EDITION])[0])
+
+def rebuild(build, names, only=None, budget=None):
+    """Re-render the pages for the changed source file names, then the index and shared outputs.
+
+    A name whose file no longer exists drops its page (commit_output()
+    deletes the output). Returns the commit delta; only the outputs whose
+    bytes changed are replaced.
+    The changed sources are validated before anything is touched, and any
+    failure (a ValidationError included) leaves the previous output, pages
+    and manifest in place, so the same names can simply be rebuilt again.
+    """
+    changed_pages = []
+    deleted = set()
+    source_re = build.edition.source_re
+    for name in names:
+        m = source_re.fullmatch(name)
+        if m and (only is None or m.group("slug") in only):
+            path = build.src_dir / name
+            if path.exists():
+                changed_pages.append(Page(m.group("slug"), path))
+            else:
+                deleted.add(m.group("slug"))
+    if changed_pages and build.validate:
+        site_stages()
+        with stage("validate"):
+            validate_pages(changed_pages, edition=build.edition,
+                           others=[page for slug, page in build.pages.items() if slug not in deleted])
+
+    # Compare against the previous round so untouched pages stay fresh.
+    build.old = dict(build.new)
+    pages_before = dict(build.pages)
+    begin_output(build)
+    try:
+        for slug in deleted:
+            build.pages.pop(slug, None)
+            build.new.pop(f"states/{slug}.html", None)
+        for page in changed_pages:
+            build.pages[page.slug] = page
+        if changed_pages:
+            build_state_pages(build, changed_pages)
+        if only is None:
+            build_index(build, sorted(build.pages.values(), key=lambda page: page.slug))
+        site_stages()
+        if build.search_index is not None:
+            write_search_index(build)
+        if build.deadline_store is not None:
+            write_deadline_data(build)
+        if build.change_store is not None:
+            write_site_files(build)
+        track_compressed(build)
+        if budget:
+            check_budget(build, budget)
+    except BaseException:
+        discard_output(build)
+        build.new = build.old
+        build.pages = pages_before
+        raise
+    delta = commit_output(build)
+    save_state(build)
+    return delta
+
+def scan_sources(src_dir):
+    """Map each markdown file in src_dir to its mtime in one scandir pass."""
+    with os.scandir(src_dir) as entries:
+        return {e.name: e.stat().st_mtime_ns for e in entries if e.name.endswith(".md")}
+
+def changed_sources(seen, current):
+    """Source names added, modified or deleted between two scan_sources() results."""
+    return sorted(name for name in seen.keys() | current.keys() if seen.get(name) != current.get(name))
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve(out_dir, port):
+    """Serve out_dir on 127.0.0.1:port from a background thread."""
+    handler = functools.partial(QuietHandler, directory=str(out_dir))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def watch(args):
+    """Build once, then serve OUT and re-render only the sources that change."""
+    build = build_editions(args)[0]
+    build.force, build.workers = False, 1
+
+    server = serve(build.out_dir, args.port)
+    print(f"\nServing {build.out_dir} at http://127.0.0.1:{server.server_port}/ "
+          f"(watching {build.src_dir}, Ctrl-C to stop)")
+
+    seen = scan_sources(build.src_dir)
+    # As in PreviewApp.refresh(): seen is the last scan that rebuilt, and a
+    # scan that failed validation is not retried until a source changes again.
+    rejected = None
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = scan_sources(build.src_dir)
+            changed = changed_sources(seen, current)
+            if not changed or current == rejected:
+                continue
+            started = time.perf_counter()
+            try:
+                rebuild(build, changed, args.only, args.budget)
+            except ValidationError as exc:
+                report_problems(exc.problems)
+                print(f"  not rebuilt: {', '.join(changed)} ({exc})")
+                rejected = current
+                continue
+            seen, rejected = current, None
+            print(f"  rebuilt {', '.join(changed)} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("\nStopping.")
+    finally:
+        server.shutdown()
+        if build.cache is not None:
+            build.cache.close()
+
+def accepts_gzip(header):
+    """Whether an Accept-Encoding header allows gzip (and does not give it q=0).
+
+    An explicit gzip entry wins over "*"; a malformed q value counts as 0.
+    """
+    found = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding in ("gzip", "*"):
+            q = params.strip().lower()
+            try:
+                found[coding] = float(q[2:] or 0) if q.startswith("q=") else 1.0
+            except ValueError:
+                found[coding] = 0.0
+    return found.get("gzip", found.get("*", 0.0)) > 0
+
+class PreviewApp:
+    """WSGI app that serves an in-memory build and keeps it current.
+
+    Each request first rescans the sources (at most every interval seconds)
+    and rebuild()s only the pages whose files changed. Responses carry an
+    ETag (a hash of the bytes, so an untouched page keeps its tag across
+    rebuilds) and honour If-None-Match; gzip is negotiated from
+    Accept-Encoding, using the build's .gz sibling when --compress gz made one.
+    """
+
+    def __init__(self, build, only=None, budget=None, interval=0.5):
+        self.build = build
+        self.only = only
+        self.budget = budget
+        self.interval = interval
+        self.seen = scan_sources(build.src_dir)
+        # The scan whose rebuild failed validation; not retried until a source changes again.
+        self.rejected = None
+        self.checked = time.monotonic()
+        self.lock = threading.Lock()
+        # rel -> (bytes, etag) and rel -> (bytes, gzipped bytes), keyed on the bytes object
+        self.etags = {}
+        self.gzipped = {}
+
+    def refresh(self):
+        with self.lock:
+            if time.monotonic() - self.checked < self.interval:
+                return
+            current = scan_sources(self.build.src_dir)
+            changed = changed_sources(self.seen, current)
+            if changed and current != self.rejected:
+                # seen only moves on after a successful rebuild, so a failed edit is retried.
+                try:
+                    delta = rebuild(self.build, changed, self.only, self.budget)
+                except ValidationError as exc:
+                    # Keep serving the last good build until the sources are fixed.
+                    report_problems(exc.problems)
+                    print(f"  not rebuilt: {', '.join(changed)} ({exc})")
+                    self.rejected = current
+                else:
+                    self.seen = current
+                    self.rejected = None
+                    print(f"  rebuilt {', '.join(changed)}: {len(delta['changed'])} changed, "
+                          f"{len(delta['added'])} added, {len(delta['deleted'])} deleted")
+            self.checked = time.monotonic()
+
+    def etag(self, rel, data):
+        cached = self.etags.get(rel)
+        if cached is None or cached[0] is not data:
+            cached = self.etags[rel] = (data, f'"{hashlib.sha256(data).hexdigest()[:20]}"')
+        return cached[1]
+
+    def gzip(self, rel, data):
+        sibling = self.build.files.get(f"{rel}.gz")
+        if sibling is not None:
+            return sibling
+        cached = self.gzipped.get(rel)
+        if cached is None or cached[0] is not data:
+            cached = self.gzipped[rel] = (data, gzip.compress(data, compresslevel=6, mtime=0))
+        return cached[1]
+
+    def __call__(self, environ, start_response):
+        method = environ.get("REQUEST_METHOD", "GET")
+        if method not in ("GET", "HEAD"):
+            start_response("405 Method Not Allowed", [("Allow", "GET, HEAD"), ("Content-Length", "0")])
+            return []
+        self.refresh()
+        rel = environ.get("PATH_INFO", "/").lstrip("/")
+        if rel == "" or rel.endswith("/"):
+            rel += "index.html"
+        data = self.build.files.get(rel)
+        if data is None:
+            body = b"Not found\n"
+            start_response("404 Not Found", [("Content-Type", "text/plain; charset=utf-8"),
+                                             ("Content-Length", str(len(body)))])
+            return [body] if method == "GET" else []
+
+        etag = self.etag(rel, data)
+        content_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/json", "application/javascript"):
+            content_type += "; charset=utf-8"
+        headers = [("Content-Type", content_type), ("Cache-Control", "no-cache")]
+        if rel.endswith(COMPRESSIBLE):
+            headers.append(("Vary", "Accept-Encoding"))
+            if accepts_gzip(environ.get("HTTP_ACCEPT_ENCODING", "")):
+                data = self.gzip(rel, data)
+                etag = etag[:-1] + '-gz"'
+                headers.append(("Content-Encoding", "gzip"))
+        headers.append(("ETag", etag))
+
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH", "")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            start_response("304 Not Modified", headers)
+            return []
+        headers.append(("Content-Length", str(len(data))))
+        start_response("200 OK", headers)
+        return [data] if method == "GET" else []
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+
+class QuietWSGIHandler(wsgiref.simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def preview(args):
+    """Build into memory and serve it through PreviewApp until Ctrl-C."""
+    build = build_site(args, files={}, edition=(args.edition or [DEFAULT_EDITION])[0])
+    build.force = False
+    app = PreviewApp(build, args.only, args.budget, args.interval)
+    server = wsgiref.simple_server.make_server("127.0.0.1", args.port, app, server_class=ThreadingWSGIServer,
+                                               handler_class=QuietWSGIHandler)
+    print(f"\nServing {len(build.files)} in-memory files from {build.src_dir} at "
+          f"http://127.0.0.1:{server.server_port}/ (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping.")
+    finally:
+        server.server_close()
+        if build.cache is not None:
+            build.cache.close()
+
+def check_links(args):
+    """Check every outbound link in the rendered OUT concurrently; returns how many are broken."""
+    links = linkcheck.collect_links(args.out)
+    cache_path = args.link_cache or state_dir(args.out) / "links.json"
+    cache = linkcheck.LinkCache(cache_path, args.link_ttl * 3600)
+    print(f"Checking {len(links)} links in {args.out} "
+          f"({args.link_concurrency} at a time, {args.link_per_host} per host)")
+
+    def progress(url, result):
+        if not result["ok"]:
+            print(f"  BROKEN: {url} ({result['status'] or result['error']})")
+
+    started = time.perf_counter()
+    results, hits = linkcheck.check_links(list(links), cache, args.link_concurrency, args.link_per_host,
+                                          args.link_timeout, progress)
+    cache.save(set(links))
+    broken = [url for url in links if not results[url]["ok"]]
+    if broken:
+        print("\nBroken links:")
+        for url in broken:
+            result = results[url]
+            print(f"  {url} ({result['status'] or result['error']})")
+            for page in links[url]:
+                print(f"    linked from {page}")
+    print(f"\nChecked {len(links)} links ({hits} cached, {len(links) - hits} requested) in "
+          f"{time.perf_counter() - started:.1f}s: {len(broken)} broken.")
+    return len(broken)
+
+def validate(args):
+    """Run only the validation pass over every --edition's sources; returns the problem count."""
+    problems = 0
+    for edition in args.edition or [DEFAULT_EDITION]:
+        started = time.perf_counter()
+        only = set(args.only) if args.only else None
+        pages = discover_pages(args.src, only, edition)
+        try:
+            validate_pages(pages, () if args.allow_missing else (only or STATE_META), edition)
+        except ValidationError as exc:
+            report_problems(exc.problems)
+            problems += len(exc.problems)
+        print(f"Validated {len(pages)} {edition.suffix} sources in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms.")
+    print(f"{problems} problem(s).")
+    return problems
+
+def parse_edition(spec):
+    """Parse an --edition value such as "2027-draft,updated=Jan 2027" or "2026,out=site/docs"."""
+    suffix, *settings = spec.split(",")
+    suffix = suffix.strip()
+    if not re.fullmatch(r"[a-z0-9][a-z0-9-]*", suffix):
+        raise argparse.ArgumentTypeError(f"bad edition suffix {suffix!r}")
+    values = {}
+    for item in settings:
+        key, sep, value = item.partition("=")
+        if not sep or key.strip() not in ("out", "updated"):
+            raise argparse.ArgumentTypeError(f"bad edition setting {item!r} (expected out=DIR or updated=TEXT)")
+        values[key.strip()] = value.strip()
+    out = Path(values["out"]) if "out" in values else None
+    if suffix == DEFAULT_EDITION.suffix and "updated" not in values:
+        return Edition(suffix, out, DEFAULT_EDITION.updated)
+    if not values.get("updated"):
+        raise argparse.ArgumentTypeError(f"edition {suffix!r} needs updated=TEXT (the footer's 'Last updated' date)")
+    return Edition(suffix, out, values["updated"])
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", nargs="?", choices=("build", "watch", "preview", "check-links", "validate"),
+                        default="build",
+                        help="build the site once (default), watch SRC and serve OUT, build into memory "
+                             "and serve it (nothing written to OUT), check the outbound links in the built OUT, "
+                             "or only validate the sources")
+    parser.add_argument("--src", type=Path, default=SRC, help="directory of source markdown files")
+    parser.add_argument("--out", type=Path, default=OUT, help="output docs/ directory")
+    parser.add_argument("--force", action="store_true", help="ignore the build manifest and rebuild every page")
+    parser.add_argument("--delta", type=Path, default=None,
+                        help="where to write the added/changed/deleted output paths as JSON "
+                             "(default: .build-cache/<OUT name>/delta.json next to OUT)")
+    parser.add_argument("--search", action="store_true",
+                        help="emit a sharded client-side search index and add a search box to the nav")
+    parser.add_argument("--data", action="store_true",
+                        help="emit the structured deadline dataset, by-month/by-agency indexes "
+                             "and per-state ICS feeds under data/")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="emit sitemap.xml and an Atom feed.xml of updated guides for the site served at URL "
+                             "(lastmod dates follow source content changes)")
+    parser.add_argument("--edition", action="append", type=parse_edition, metavar="SUFFIX[,out=DIR][,updated=TEXT]",
+                        help="build the edition whose sources end in -SUFFIX.md (repeatable; default 2026-draft). "
+                             "Several editions share one worker pool and fragment cache; each goes to its "
+                             "out= root (default <OUT parent>/SUFFIX/<OUT name>) and its footer says "
+                             "'Last updated TEXT' (required except for the default edition)")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="skip the source validation pass that runs before rendering")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="report expected state sources that do not exist instead of failing the build")
+    parser.add_argument("--only", action="append", metavar="SLUG",
+                        help="build only this page (repeatable); skips the index")
+    parser.add_argument("--css", choices=CSS_MODES, default="inline",
+                        help="inline the stylesheet, link a fingerprinted assets/site.<hash>.css, "
+                             "or link it and inline only critical rules")
+    parser.add_argument("--minify", action="store_true",
+                        help="minify HTML and CSS output (whitespace and comments; pre/script untouched)")
+    parser.add_argument("--compress", action="append", choices=COMPRESS_FORMATS, metavar="FORMAT",
+                        help="also write a pre-compressed .gz or .br sibling of each text output (repeatable)")
+    parser.add_argument("--budget", type=float, metavar="KB",
+                        help="fail the build if any HTML page is larger than KB kilobytes")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="render state pages in N worker processes (0 = one per CPU)")
+    parser.add_argument("--cache", type=Path, default=None,
+                        help="rendered-fragment cache file (default: .build-cache/fragments.sqlite next to OUT, "
+                             "or next to the editions' common parent when building several)")
+    parser.add_argument("--cache-size", type=int, default=64, help="fragment cache size limit in MB")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the fragment cache")
+    parser.add_argument("--profile", type=Path, metavar="REPORT.json",
+                        help="time each page's build stages and write a JSON report")
+    parser.add_argument("--profile-top", type=int, default=10, help="slowest pages to list with --profile")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, also record per-stage allocation peaks via tracemalloc")
+    parser.add_argument("--cprofile", type=Path, metavar="STATS.prof",
+                        help="run the build under cProfile and dump stats (profiles the parent process)")
+    parser.add_argument("--port", type=int, default=8000, help="watch/preview: local HTTP server port")
+    parser.add_argument("--interval", type=float, default=0.05,
+                        help="watch/preview: seconds between source scans")
+    parser.add_argument("--link-cache", type=Path, default=None,
+                        help="check-links: result cache (default: .build-cache/<OUT name>/links.json next to OUT)")
+    parser.add_argument("--link-ttl", type=float, default=24,
+                        help="check-links: hours before a link that checked OK is requested again")
+    parser.add_argument("--link-concurrency", type=int, default=32,
+                        help="check-links: requests in flight at once")
+    parser.add_argument("--link-per-host", type=int, default=4,
+                        help="check-links: requests in flight to any one host")
+    parser.add_argument("--link-timeout", type=float, default=10,
+                        help="check-links: seconds to wait for a connection or response")
+    args = parser.parse_args(argv)
+    if args.command in ("watch", "preview") and args.edition and len(args.edition) > 1:
+        parser.error(f"{args.command} serves one edition at a time")
+    if args.site_url and not re.match(r"https?://[^/\s]+", args.site_url):
+        parser.error("--site-url must be an absolute http(s) URL")
+    if args.compress and "br" in args.compress and brotli is None:
+        parser.error("--compress br needs the brotli package (pip install brotli)")
+    if args.compress:
+        args.compress = sorted(set(args.compress), key=COMPRESS_FORMATS.index)
+    return args
+
+def main(argv=None):
+    global profiler
+    args = parse_args(argv)
+    if args.profile:
+        profiler = StageProfiler(memory=args.profile_memory)
+    if args.command == "watch":
+        with exit_on_invalid():
+            watch(args)
+        return
+    if args.command == "preview":
+        with exit_on_invalid():
+            preview(args)
+        return
+    if args.command == "check-links":
+        if check_links(args):
+            raise SystemExit(1)
+        return
+    if args.command == "validate":
+        if validate(args):
+            raise SystemExit(1)
+        return
+    cprof = None
+    if args.cprofile:
+        cprof = cProfile.Profile()
+        cprof.enable()
+    with exit_on_invalid():
+        builds = build_editions(args)
+    for cache in {build.cache for build in builds if build.cache is not None}:
+        cache.close()
+    if cprof is not None:
+        cprof.disable()
+        cprof.dump_stats(str(args.cprofile))
+        print(f"cProfile stats written to {args.cprofile}")
+    if profiler is not None:
+        report = profiler.report()
+        args.profile.parent.mkdir(parents=True, exist_ok=True)
+        args.profile.write_text(json.dumps(report, indent=1, sort_keys=True), encoding="utf-8")
+        print_profile_summary(report, args.profile_top)
+        print(f"Profile report written to {args.profile}")
 
-(OUT.parent / "_config.yml").write_text("theme: null\n")
-print("Build complete.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""Structured deadline records extracted from the rendered state guides.
+
+build.py calls page_records() on each rendered page body (in the worker that
+rendered it). It reads the "Quick ... snapshot" table and the h3 entries
+under "Verified <State> filing points" into typed records, keeps them per page
+in a DeadlineStore under .build-cache, and calls dataset_files() to write:
+
+  data/deadlines.json   column-major table of every record (repetitive
+                        columns dictionary-encoded)
+  data/by-month.json    {"01".."12": [row, ...]} for records with a due month
+  data/by-agency.json   {agency: [row, ...]}
+  data/by-recurrence.json  {annual|quarterly|...: [row, ...]}
+  data/ics/<slug>.ics   one calendar feed per state
+
+The store tracks which pages' records a put() or retain() changed, and
+dataset_files() rewrites only their ICS feeds, plus the four dataset files
+when anything changed at all.
+
+Extraction is best effort: due dates and recurrences are only recorded when
+the guide states them ("Annually by April 15", "Quarterly", "every 5 years"),
+never guessed.
+"""
+
+import calendar
+import hashlib
+import json
+import re
+from html.parser import HTMLParser
+
+DATASET_VERSION = 2
+FIELDS = ("state", "state_name", "kind", "filing", "agency", "owner", "cadence",
+          "recurrence", "due_month", "due_day", "source_url")
+
+# Repetitive columns are stored as codes into dictionaries[field].
+DICT_FIELDS = frozenset({"state", "state_name", "kind", "agency", "owner", "recurrence", "source_url"})
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+DATE_RE = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b",
+    re.IGNORECASE,
+)
+NOT_DUE_RE = re.compile(r"\b(effective|since|as of|beginning|starting|enacted|amended)\b[^.]*$", re.IGNORECASE)
+EVERY_YEARS_RE = re.compile(r"\bevery\s+(\d+|two|three|four|five)\s+years?\b", re.IGNORECASE)
+EVERY_MONTHS_RE = re.compile(r"\bevery\s+(\d+)\s+months\b", re.IGNORECASE)
+NUMBER_WORDS = {"two": 2, "three": 3, "four": 4, "five": 5}
+# Only an acronym in parentheses names the agency ("Annual report (SOS)");
+# anything else there is usually a form number.
+AGENCY_RE = re.compile(r"\(([A-Z]{2,5})[,)]")
+LEADING_NUMBER_RE = re.compile(r"^\s*\d+[.)]\s*")
+WORD_RE = re.compile(r"[a-z0-9]+")
+MATCH_STOPWORDS = frozenset(
+    "a an and the of for to in on by if or with annual report filing state church churches "
+    "accessed requirements".split()
+)
+
+def recurrence(text):
+    """Normalised recurrence stated in text, or None if it does not say."""
+    lower = text.lower()
+    if "quarterly" in lower:
+        return "quarterly"
+    if "monthly" in lower:
+        return "monthly"
+    if "biennial" in lower:
+        return "biennial"
+    m = EVERY_YEARS_RE.search(lower)
+    if m:
+        years = NUMBER_WORDS.get(m.group(1)) or int(m.group(1))
+        return "biennial" if years == 2 else f"every-{years}-years"
+    m = EVERY_MONTHS_RE.search(lower)
+    if m and int(m.group(1)) % 12 == 0:
+        years = int(m.group(1)) // 12
+        return "annual" if years == 1 else "biennial" if years == 2 else f"every-{years}-years"
+    if re.search(r"\b(annual|annually|yearly|each year|every year)\b", lower):
+        return "annual"
+    if "one-time" in lower or "one time" in lower:
+        return "one-time"
+    return None
+
+def due_date(text):
+    """(month, day) of the first explicit, possible calendar date in text, else (None, None)."""
+    for m in DATE_RE.finditer(text):
+        month = MONTHS[m.group(1)[:3].lower()]
+        day = int(m.group(2))
+        # "February 30" is a typo, not a date; 2024 (a leap year) allows February 29.
+        if not 1 <= day <= calendar.monthrange(2024, month)[1]:
+            continue
+        # "effective January 1, 2025" dates a rule, not a deadline.
+        if not NOT_DUE_RE.search(text, max(0, m.start() - 24), m.start()):
+            return month, day
+    return None, None
+
+def event_uid(slug, rec):
+    """Stable iCalendar UID: the same filing on the same date keeps it when rows are added or moved."""
+    key = f"{slug}|{rec['filing']}|{rec['due_month']:02d}{rec['due_day']:02d}"
+    return f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:20]}@church-compliance-directory"
+
+class _Blocks(HTMLParser):
+    """Flatten a rendered body into (tag, text, links) blocks; tables as ("table", rows)."""
+
+    BLOCK_TAGS = ("h1", "h2", "h3", "p", "li")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self.block = None
+        self.rows = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.rows = []
+        elif tag == "tr" and self.rows is not None:
+            self.rows.append([])
+        elif tag in ("td", "th") and self.rows is not None:
+            self.cell = []
+        elif tag in self.BLOCK_TAGS and self.rows is None:
+            self.block = (tag, [], [])
+        elif tag == "a" and self.block is not None:
+            href = dict(attrs).get("href")
+            if href:
+                self.block[2].append(href)
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self.rows is not None:
+            self.blocks.append(("table", self.rows, []))
+            self.rows = None
+        elif tag in ("td", "th") and self.cell is not None:
+            if self.rows:
+                self.rows[-1].append(" ".join("".join(self.cell).split()))
+            self.cell = None
+        elif tag in self.BLOCK_TAGS and self.block is not None and self.block[0] == tag:
+            name, text, links = self.block
+            self.blocks.append((name, " ".join("".join(text).split()), links))
+            self.block = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+        elif self.block is not None:
+            self.block[1].append(data)
+
+# Words that imply an agency the Sources list names differently.
+WORD_ALIASES = {"federal": "irs", "sos": "secretary", "ag": "attorney"}
+
+def _words(text):
+    words = {word for word in WORD_RE.findall(text.lower()) if word not in MATCH_STOPWORDS}
+    return words | {WORD_ALIASES[word] for word in words if word in WORD_ALIASES}
+
+def _agency(text):
+    m = AGENCY_RE.search(text)
+    return m.group(1) if m else None
+
+def _sources(blocks):
+    """[(label, agency, url)] from list items after the Sources heading."""
+    sources = []
+    in_sources = False
+    for tag, text, links in blocks:
+        if tag == "h2":
+            in_sources = text.strip().lower() == "sources"
+        elif in_sources and tag == "li" and links:
+            label = text.split("http", 1)[0].rstrip(": ")
+            agency = label.split(" \u2014 ", 1)[0].strip() if " \u2014 " in label else None
+            sources.append((label, agency, links[0]))
+    return sources
+
+def _best_source(text, sources, ignore):
+    """The Sources entry sharing the most words with text (None if none overlap)."""
+    words = _words(text) - ignore
+    best, best_score = None, 0
+    for source in sources:
+        score = len(words & (_words(source[0]) - ignore))
+        if score > best_score:
+            best, best_score = source, score
+    return best
+
+def page_records(slug, state_name, body_html):
+    """Return the deadline records (dicts keyed by FIELDS) for one rendered guide."""
+    parser = _Blocks()
+    parser.feed(body_html)
+    parser.close()
+    blocks = parser.blocks
+    sources = _sources(blocks)
+    ignore = _words(state_name)
+    records = []
+
+    def record(kind, filing, cadence, owner, agency, links, context):
+        month, day = due_date(cadence) if cadence else (None, None)
+        if month is None:
+            month, day = due_date(context)
+        source = _best_source(f"{filing} {agency or ''}", sources, ignore)
+        records.append({
+            "state": slug,
+            "state_name": state_name,
+            "kind": kind,
+            "filing": filing,
+            "agency": agency or (source[1] if source else None),
+            "owner": owner,
+            "cadence": cadence,
+            "recurrence": recurrence(cadence or "") or recurrence(context),
+            "due_month": month,
+            "due_day": day,
+            "source_url": links[0] if links else (source[2] if source else None),
+        })
+
+    section = ""
+    for i, (tag, content, links) in enumerate(blocks):
+        if tag == "h2":
+            section = content.lower()
+        elif tag == "table" and "snapshot" in section and content:
+            header = [cell.lower() for cell in content[0]]
+            col = {name: header.index(name) for name in ("item", "typical cadence", "owner") if name in header}
+            if "item" not in col:
+                continue
+            for row in content[1:]:
+                cell = lambda name: row[col[name]] if name in col and col[name] < len(row) else None
+                filing = cell("item")
+                if filing:
+                    record("snapshot", filing, cell("typical cadence"), cell("owner"),
+                           _agency(filing), [], "")
+        elif tag == "h3" and section.startswith("verified") and "filing points" in section:
+            title = LEADING_NUMBER_RE.sub("", content)
+            filing, _, cadence = title.partition(" \u2014 ")
+            # The section's paragraphs (up to the next heading) give context and links.
+            context, section_links = [], []
+            for next_tag, next_text, next_links in blocks[i + 1:]:
+                if next_tag in ("h2", "h3"):
+                    break
+                if next_tag == "p":
+                    context.append(next_text)
+                    section_links.extend(link for link in next_links if link.startswith("http"))
+            record("filing_point", filing.strip(), cadence.strip() or None, None,
+                   _agency(filing), section_links, " ".join(context[:1]))
+    return records
+
+class DeadlineStore:
+    """Per-page deadline records persisted between builds as JSON (path None: memory only)."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            data = json.loads(path.read_text(encoding="utf-8")) if path is not None else {}
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != DATASET_VERSION:
+            data = {}
+        self.pages = data.get("pages", {})
+        # What dataset_files() last produced: {page key: its ICS path} and
+        # {data/ path: sha256 of its text} for every file of the dataset.
+        self.feeds = data.get("feeds", {})
+        self.hashes = data.get("hashes", {})
+        # Pages whose records changed since the last dataset_files() call.
+        self.stale = set()
+
+    def __contains__(self, key):
+        return key in self.pages
+
+    def put(self, key, records):
+        if self.pages.get(key) != records:
+            self.stale.add(key)
+        self.pages[key] = records
+
+    def retain(self, keys):
+        for key in list(self.pages):
+            if key not in keys:
+                del self.pages[key]
+                self.stale.add(key)
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": DATASET_VERSION, "pages": self.pages, "feeds": self.feeds, "hashes": self.hashes}
+        self.path.write_text(json.dumps(data, separators=(",", ":"), sort_keys=True), encoding="utf-8")
+
+def _compact(obj):
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+def _ics_text(value):
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n"))
+
+def _ics_fold(line):
+    """Fold an iCalendar content line at 75 octets."""
+    out = []
+    data = line.encode("utf-8")
+    while len(data) > 75:
+        cut = 75 if not out else 74
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        out.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    out.append(data.decode("utf-8"))
+    return "\r\n ".join(out)
+
+RRULES = {
+    "monthly": "FREQ=MONTHLY",
+    "quarterly": "FREQ=MONTHLY;INTERVAL=3",
+    "annual": "FREQ=YEARLY",
+    "biennial": "FREQ=YEARLY;INTERVAL=2",
+}
+
+def _same_filing(a, b, ignore):
+    """Whether a snapshot row and a filing-point section describe one filing due on one date."""
+    if a["kind"] == b["kind"]:
+        return False
+    if (a["due_month"], a["due_day"], a["recurrence"]) != (b["due_month"], b["due_day"], b["recurrence"]):
+        return False
+    words_a, words_b = _words(a["filing"]) - ignore, _words(b["filing"]) - ignore
+    return bool(words_a & words_b) or words_a == words_b or (
+        a["source_url"] is not None and a["source_url"] == b["source_url"])
+
+def ics_feed(slug, state_name, records, year, stamp):
+    """An iCalendar feed with one all-day event per record that has a due date."""
+    calendar_name = f"Church compliance deadlines \u2014 {state_name}"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Church Compliance Directory//Deadlines//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_text(calendar_name)}",
+    ]
+    ignore = _words(state_name)
+    events = []
+    for rec in records:
+        if rec["due_month"] is None:
+            continue
+        if rec["due_day"] > calendar.monthrange(year, rec["due_month"])[1]:
+            continue  # February 29 outside a leap year
+        # The snapshot row and its filing-point section often state the same filing;
+        # other filings due that day still get their own event.
+        if any(_same_filing(event, rec, ignore) for event in events):
+            continue
+
+        events.append(rec)
+        rrule = RRULES.get(rec["recurrence"])
+        m = re.fullmatch(r"every-(\d+)-years", rec["recurrence"] or "")
+        if m:
+            rrule = f"FREQ=YEARLY;INTERVAL={m.group(1)}"
+        description = " | ".join(part for part in (
+            rec["cadence"], rec["agency"] and f"Agency: {rec['agency']}",
+            rec["owner"] and f"Owner: {rec['owner']}", rec["source_url"],
+        ) if part)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{event_uid(slug, rec)}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{year}{rec['due_month']:02d}{rec['due_day']:02d}",
+            f"SUMMARY:{_ics_text(rec['filing'])}",
+            f"DESCRIPTION:{_ics_text(description)}",
+        ]
+        if rrule:
+            lines.append(f"RRULE:{rrule}")
+        if rec["source_url"]:
+            lines.append(f"URL:{rec['source_url']}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_ics_fold(line) for line in lines) + "\r\n"
+
+def dataset_files(store, year, everything=False):
+    """Return {relative path: text} for the data/ files changed since the last call.
+
+    The column table and indexes are rebuilt when any page's records changed,
+    but only those pages' ICS feeds are (every file with everything=True, e.g.
+    when OUT no longer matches store.hashes). store.hashes then lists every
+    file of the dataset.
+    """
+    if everything:
+        store.feeds, store.hashes = {}, {}
+        stale = set(store.pages)
+    else:
+        stale = store.stale
+    files = {}
+    if stale or not store.hashes:
+        files.update(_table_files(store, year))
+    # A fixed DTSTAMP keeps feeds byte-stable between builds of the same data.
+    stamp = f"{year}0101T000000Z"
+    for key in sorted(stale):
+        rel = store.feeds.pop(key, None)
+        if rel is not None:
+            del store.hashes[rel]
+        records = store.pages.get(key)
+        if records:
+            slug = records[0]["state"]
+            rel = store.feeds[key] = f"data/ics/{slug}.ics"
+            files[rel] = ics_feed(slug, records[0]["state_name"], records, year, stamp)
+    for rel, text in files.items():
+        store.hashes[rel] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    store.stale = set()
+    return files
+
+def _table_files(store, year):
+    """{relative path: text} for deadlines.json and the by-month/agency/recurrence indexes."""
+    rows = [rec for key in sorted(store.pages) for rec in store.pages[key]]
+    columns = {}
+    dictionaries = {}
+    for name in FIELDS:
+        values = [rec[name] for rec in rows]
+        if name in DICT_FIELDS:
+            codes = {}
+            columns[name] = [codes.setdefault(value, len(codes)) for value in values]
+            dictionaries[name] = list(codes)
+        else:
+            columns[name] = values
+    by_month, by_agency, by_recurrence = {}, {}, {}
+    for i, rec in enumerate(rows):
+        if rec["due_month"] is not None:
+            by_month.setdefault(f"{rec['due_month']:02d}", []).append(i)
+        if rec["agency"]:
+            by_agency.setdefault(rec["agency"], []).append(i)
+        if rec["recurrence"]:
+            by_recurrence.setdefault(rec["recurrence"], []).append(i)
+
+    return {
+        "data/deadlines.json": _compact({
+            "version": DATASET_VERSION, "year": year, "fields": list(FIELDS),
+            "rows": len(rows), "columns": columns, "dictionaries": dictionaries,
+        }),
+        "data/by-month.json": _compact(by_month),
+        "data/by-agency.json": _compact(by_agency),
+        "data/by-recurrence.json": _compact(by_recurrence),
+    }
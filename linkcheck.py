@@ -0,0 +1,188 @@
+"""Concurrent checker for the outbound links in the rendered site.
+
+build.py's check-links command calls collect_links() on OUT and hands the
+URLs to check_links(), which runs one asyncio task per URL:
+
+  - a global semaphore caps open connections, and a per-host semaphore keeps
+    any one agency site from seeing more than a few at a time;
+  - each URL gets a HEAD request (redirects followed), falling back to GET
+    when the server errors on or refuses HEAD;
+  - results live in a LinkCache under .build-cache, and a URL that checked
+    OK within the TTL is not requested again. Failures are always re-checked.
+
+Requests are made with asyncio streams (no third-party HTTP client), so a
+local stub server on http://127.0.0.1:<port>/ is enough to exercise it;
+bench/linkcheck_stub.py does that for HEAD->GET fallback, redirects,
+broken and refused links, and cache TTL hits.
+"""
+
+import asyncio
+import html
+import json
+import os
+import re
+import ssl
+import time
+from urllib.parse import urljoin, urlsplit
+
+CACHE_VERSION = 1
+MAX_REDIRECTS = 5
+USER_AGENT = "church-compliance-directory-linkcheck/1.0"
+HREF_RE = re.compile(r"""<a\b[^>]*?\bhref=["'](https?://[^"'\s]+)["']""", re.IGNORECASE)
+# HEAD answers that usually mean "HEAD not supported here", not "link is dead".
+RETRY_WITH_GET = frozenset({400, 403, 404, 405, 406, 429, 500, 501, 503})
+FETCH_ERRORS = (OSError, ValueError, asyncio.TimeoutError, ssl.SSLError)
+
+def collect_links(out_dir):
+    """Map every absolute http(s) href in out_dir's HTML pages to the pages linking it."""
+    links = {}
+    for dirpath, _, filenames in os.walk(out_dir):
+        for name in sorted(filenames):
+            if not name.endswith(".html"):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, out_dir).replace(os.sep, "/")
+            with open(path, encoding="utf-8") as f:
+                for href in HREF_RE.findall(f.read()):
+                    url = html.unescape(href).split("#", 1)[0]
+                    links.setdefault(url, []).append(rel)
+    return {url: sorted(set(pages)) for url, pages in sorted(links.items())}
+
+class LinkCache:
+    """Last result per URL, persisted between runs as JSON."""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != CACHE_VERSION:
+            data = {}
+        self.results = data.get("results", {})
+
+    def fresh(self, url, now):
+        """The cached result for url if it was OK and checked within the TTL."""
+        result = self.results.get(url)
+        if result and result["ok"] and now - result["checked"] < self.ttl:
+            return result
+        return None
+
+    def put(self, url, result):
+        self.results[url] = result
+
+    def save(self, keep):
+        """Write the cache, forgetting URLs that are no longer linked."""
+        self.results = {url: result for url, result in self.results.items() if url in keep}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": CACHE_VERSION, "results": self.results}
+        self.path.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+
+async def _request(method, url, timeout):
+    """Send one request and read only the status line and headers: (status, headers)."""
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    context = ssl.create_default_context() if secure else None
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=context,
+                                server_hostname=parts.hostname if secure else None),
+        timeout,
+    )
+    try:
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        host = parts.netloc.rsplit("@", 1)[-1]
+        writer.write(
+            f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+            f"Accept: */*\r\nConnection: close\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.decode("latin-1").split(None, 2)
+        if len(fields) < 2 or not fields[0].startswith("HTTP/") or not fields[1].isdigit():
+            raise ValueError(f"bad status line {status_line[:60]!r}")
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return int(fields[1]), headers
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+async def _fetch(method, url, timeout):
+    """Follow redirects from url; returns (status, final url)."""
+    for _ in range(MAX_REDIRECTS + 1):
+        status, headers = await _request(method, url, timeout)
+        if status in (301, 302, 303, 307, 308) and "location" in headers:
+            url = urljoin(url, headers["location"])
+            if urlsplit(url).scheme not in ("http", "https"):
+                raise ValueError(f"redirect to unsupported URL {url}")
+            continue
+        return status, url
+    raise ValueError(f"more than {MAX_REDIRECTS} redirects")
+
+def _describe(exc):
+    return f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+
+async def check_url(url, timeout):
+    """Check one URL: HEAD first, GET if HEAD fails. Returns a cacheable result dict."""
+    result = {"ok": False, "status": None, "method": "HEAD", "final": None, "error": None,
+              "checked": time.time()}
+    status = final = None
+    try:
+        status, final = await _fetch("HEAD", url, timeout)
+    except FETCH_ERRORS:
+        pass
+    if status is None or status in RETRY_WITH_GET:
+        try:
+            status, final = await _fetch("GET", url, timeout)
+            result["method"] = "GET"
+        except FETCH_ERRORS as exc:
+            if status is None:
+                result["error"] = _describe(exc)
+                return result
+    result.update(ok=200 <= status < 400, status=status, final=final if final != url else None)
+    return result
+
+async def _check_all(urls, concurrency, per_host, timeout, progress):
+    slots = asyncio.Semaphore(concurrency)
+    hosts = {}
+
+    async def one(url):
+        host = (urlsplit(url).hostname or "").lower()
+        host_slots = hosts.setdefault(host, asyncio.Semaphore(per_host))
+        async with host_slots, slots:
+            result = await check_url(url, timeout)
+        progress(url, result)
+        return url, result
+
+    return dict(await asyncio.gather(*(one(url) for url in urls)))
+
+def check_links(urls, cache, concurrency=32, per_host=4, timeout=10.0, progress=None):
+    """Check urls (skipping fresh cache hits); returns ({url: result}, cache hits)."""
+    now = time.time()
+    results = {}
+    todo = []
+    for url in urls:
+        cached = cache.fresh(url, now)
+        if cached is not None:
+            results[url] = cached
+        else:
+            todo.append(url)
+    hits = len(results)
+    if todo:
+        checked = asyncio.run(_check_all(todo, concurrency, per_host, timeout, progress or (lambda url, result: None)))
+        for url, result in checked.items():
+            cache.put(url, result)
+        results.update(checked)
+    return results, hits
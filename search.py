@@ -0,0 +1,364 @@
+"""Build-time client-side search index for the compliance directory.
+
+build.py calls page_terms() on each rendered page body (in the worker that
+rendered it), keeps the per-page terms in a SearchStore under .build-cache so
+unchanged pages are never re-tokenized, and calls index_files() to lay the
+index out as small JSON shards:
+
+  search/index.json     shard list and doc-chunk size (fetched first)
+  search/t-<pfx>.json   {term: [doc, score, doc, score, ...]} for terms
+                        starting with <pfx>; a shard over SHARD_BYTES is
+                        split into longer prefixes, and the loader uses
+                        the longest listed prefix of each query term
+  search/d-<n>.json     [url, title, description] for a block of doc ids
+  search/search.js      loader that fetches only the shards a query needs
+
+Doc ids are allocated once per page and kept stable, so adding or editing
+one page only changes the shards for that page's terms. The store tracks
+which prefixes and doc blocks a put() or retain() touched, and index_files()
+regenerates only those.
+"""
+
+import hashlib
+import json
+import re
+from html.parser import HTMLParser
+
+INDEX_VERSION = 1
+PREFIX_LEN = 2
+SHARD_BYTES = 32 * 1024
+DOC_CHUNK = 256
+# Only the best-scoring documents per term are kept; the loader shows 20.
+MAX_POSTINGS = 200
+
+# Weight of a term by the element it appears in; anything else counts 1.
+WEIGHTS = {"h1": 8, "h2": 5, "h3": 5, "th": 3, "td": 2, "strong": 2}
+TITLE_WEIGHT = 10
+
+URL_RE = re.compile(r"https?://\S+")
+WORD_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have if in into is it its of on or "
+    "that the their this to was were will with your you our we not can may".split()
+)
+SKIP_TAGS = frozenset({"script", "style", "code", "pre"})
+
+def words(text):
+    """Lowercased index terms in text: URLs dropped, stopwords and 1-char tokens skipped."""
+    text = URL_RE.sub(" ", text.lower().replace("’", "'"))
+    for word in WORD_RE.findall(text):
+        word = word.replace("'", "")
+        if len(word) > 1 and word not in STOPWORDS:
+            yield word
+
+class _TermCollector(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.terms = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag in WEIGHTS or tag in SKIP_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.stack:
+            # Pop back to the matching open tag (tolerates unclosed children).
+            while self.stack and self.stack.pop() != tag:
+                pass
+
+    def handle_data(self, data):
+        if any(tag in SKIP_TAGS for tag in self.stack):
+            return
+        weight = max((WEIGHTS[tag] for tag in self.stack if tag in WEIGHTS), default=1)
+        for word in words(data):
+            self.terms[word] = self.terms.get(word, 0) + weight
+
+def page_terms(title, body_html):
+    """Return {term: score} for a rendered page body plus its display title."""
+    collector = _TermCollector()
+    collector.feed(body_html)
+    collector.close()
+    terms = collector.terms
+    for word in words(title):
+        terms[word] = terms.get(word, 0) + TITLE_WEIGHT
+    return terms
+
+class SearchStore:
+    """Per-page terms and stable doc ids, persisted between builds as JSON (path None: memory only)."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            data = json.loads(path.read_text(encoding="utf-8")) if path is not None else {}
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != INDEX_VERSION:
+            data = {}
+        self.ids = data.get("ids", {})
+        self.docs = data.get("docs", {})
+        # Next doc id to hand out; never decreases, so removed pages' ids are not reused.
+        self.next_id = data.get("next_id", max(self.ids.values(), default=-1) + 1)
+        # What index_files() last produced: shard names per PREFIX_LEN prefix, and
+        # {search/ path: sha256 of its text} for every file of the current index.
+        self.shards = data.get("shards", {})
+        self.hashes = data.get("hashes", {})
+        # Prefixes and doc blocks changed since the last index_files() call.
+        self.stale_prefixes = set()
+        self.stale_chunks = set()
+        # {prefix: {term: {doc id: score}}}, built on first use and then kept current.
+        self._postings = None
+
+    def __contains__(self, key):
+        return key in self.docs
+
+    def put(self, key, url, title, description, terms):
+        if key not in self.ids:
+            self.ids[key] = self.next_id
+            self.next_id += 1
+        doc_id = self.ids[key]
+        old = self.docs.get(key) or {"url": None, "title": None, "description": None, "terms": {}}
+        if (old["url"], old["title"], old["description"]) != (url, title, description):
+            self.stale_chunks.add(doc_id // DOC_CHUNK)
+        changed = {term: score for term, score in terms.items() if old["terms"].get(term) != score}
+        removed = {term: score for term, score in old["terms"].items() if term not in terms}
+        self.stale_prefixes.update(term[:PREFIX_LEN] for term in (*changed, *removed))
+        self._post(doc_id, removed, remove=True)
+        self._post(doc_id, changed)
+        self.docs[key] = {"url": url, "title": title, "description": description, "terms": terms}
+
+    def retain(self, keys):
+        """Forget pages that are no longer built (their ids are not reused)."""
+        for key in list(self.docs):
+            if key not in keys:
+                doc_id = self.ids.pop(key)
+                terms = self.docs.pop(key)["terms"]
+                self.stale_chunks.add(doc_id // DOC_CHUNK)
+                self.stale_prefixes.update(term[:PREFIX_LEN] for term in terms)
+                self._post(doc_id, terms, remove=True)
+
+    def _post(self, doc_id, terms, remove=False):
+        if self._postings is None:
+            return
+        for term, score in terms.items():
+            group = self._postings.setdefault(term[:PREFIX_LEN], {})
+            if not remove:
+                group.setdefault(term, {})[doc_id] = score
+                continue
+            postings = group.get(term, {})
+            postings.pop(doc_id, None)
+            if not postings:
+                group.pop(term, None)
+
+    def postings(self):
+        """{prefix: {term: {doc id: score}}} over every stored page."""
+        if self._postings is None:
+            self._postings = {}
+            for key, doc in self.docs.items():
+                doc_id = self.ids[key]
+                for term, score in doc["terms"].items():
+                    self._postings.setdefault(term[:PREFIX_LEN], {}).setdefault(term, {})[doc_id] = score
+        return self._postings
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": INDEX_VERSION, "ids": self.ids, "docs": self.docs, "next_id": self.next_id,
+                "shards": self.shards, "hashes": self.hashes}
+        self.path.write_text(json.dumps(data, separators=(",", ":"), sort_keys=True), encoding="utf-8")
+
+def _compact(obj):
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+def _split_shard(prefix, terms):
+    """Return {prefix: shard JSON}, splitting on one more character while over SHARD_BYTES."""
+    text = _compact(terms)
+    if len(text) <= SHARD_BYTES or all(len(term) <= len(prefix) for term in terms):
+        return {prefix: text}
+    rest = {}
+    groups = {}
+    for term, postings in terms.items():
+        if len(term) > len(prefix):
+            groups.setdefault(term[:len(prefix) + 1], {})[term] = postings
+        else:
+            rest[term] = postings
+    shards = {prefix: _compact(rest)} if rest else {}
+    for sub, group in groups.items():
+        shards.update(_split_shard(sub, group))
+    return shards
+
+def index_files(store, everything=False):
+    """Return {relative path: text} for the search/ files changed since the last call.
+
+    Only the shards of prefixes and the doc blocks that put()/retain() touched
+    are regenerated (every file with everything=True, e.g. when OUT no longer
+    matches store.hashes). store.hashes then lists every file of the index.
+    """
+    postings = store.postings()
+    chunks = {}
+    for key, doc_id in store.ids.items():
+        chunks.setdefault(doc_id // DOC_CHUNK, []).append(key)
+    if everything:
+        store.shards, store.hashes = {}, {}
+        prefixes, stale = set(postings), set(chunks)
+    else:
+        prefixes, stale = store.stale_prefixes, store.stale_chunks
+    files = {}
+    for prefix in prefixes:
+        for name in store.shards.pop(prefix, ()):
+            del store.hashes[f"search/t-{name}.json"]
+        terms = postings.get(prefix)
+        if not terms:
+            continue
+        packed = {}
+        for term, docs in terms.items():
+            ranked = sorted(docs.items(), key=lambda posting: (-posting[1], posting[0]))
+            packed[term] = [value for doc_id, score in ranked[:MAX_POSTINGS] for value in (doc_id, score)]
+        shards = _split_shard(prefix, packed)
+        store.shards[prefix] = sorted(shards)
+        for name, text in shards.items():
+            files[f"search/t-{name}.json"] = text
+
+    for n in stale:
+        rel = f"search/d-{n}.json"
+        store.hashes.pop(rel, None)
+        if n not in chunks:
+            continue
+        chunk = [None] * DOC_CHUNK
+        for key in chunks[n]:
+            doc = store.docs[key]
+            chunk[store.ids[key] % DOC_CHUNK] = [doc["url"], doc["title"], doc["description"]]
+        while chunk and chunk[-1] is None:
+            chunk.pop()
+        files[rel] = _compact(chunk)
+
+    if prefixes or "search/index.json" not in store.hashes:
+        files["search/index.json"] = _compact({
+            "version": INDEX_VERSION,
+            "prefix": PREFIX_LEN,
+            "chunk": DOC_CHUNK,
+            "shards": sorted(name for names in store.shards.values() for name in names),
+        })
+    if "search/search.js" not in store.hashes:
+        files["search/search.js"] = SEARCH_JS
+    for rel, text in files.items():
+        store.hashes[rel] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    store.stale_prefixes = set()
+    store.stale_chunks = set()
+    return files
+
+# Markup for the nav; build.py adds it to HTML_TEMPLATE when --search is on.
+SEARCH_FORM = (
+    '<form class="site-search" role="search" onsubmit="return false">'
+    '<input type="search" id="site-search" placeholder="Search guides" '
+    'aria-label="Search guides" autocomplete="off">'
+    '<div id="site-search-results" hidden></div></form>'
+    '<script src="/search/search.js" defer></script>'
+)
+
+SEARCH_JS = r"""(function () {
+  "use strict";
+  var base = "/search/", meta = null, cache = {};
+  var stop = {STOPWORDS};
+  function get(name) {
+    if (!cache[name]) {
+      cache[name] = fetch(base + name).then(function (r) { return r.ok ? r.json() : null; });
+    }
+    return cache[name];
+  }
+  function terms(q) {
+    return (q.toLowerCase().replace(/https?:\/\/\S+/g, " ").match(/[a-z0-9]+(?:[-'][a-z0-9]+)*/g) || [])
+      .map(function (w) { return w.replace(/'/g, ""); })
+      .filter(function (w) { return w.length > 1 && stop.indexOf(w) < 0; });
+  }
+  function shardsFor(term, last) {
+    // The longest listed prefix of the term holds it; the word being typed
+    // also matches longer terms, which may live in longer-prefix shards.
+    var best = null, names = [];
+    meta.shards.forEach(function (p) {
+      if (term.indexOf(p) === 0 && (!best || p.length > best.length)) { best = p; }
+    });
+    if (best) { names.push(best); }
+    if (last) {
+      meta.shards.forEach(function (p) {
+        if (p !== best && p.indexOf(term) === 0) { names.push(p); }
+      });
+    }
+    return names;
+  }
+  function lookup(term, last) {
+    return Promise.all(shardsFor(term, last).map(function (p) { return get("t-" + p + ".json"); }))
+      .then(function (shards) {
+        var scores = {};
+        shards.forEach(function (shard) {
+          Object.keys(shard || {}).forEach(function (t) {
+            if (t === term || (last && t.indexOf(term) === 0)) {
+              var p = shard[t];
+              for (var i = 0; i < p.length; i += 2) {
+                scores[p[i]] = Math.max(scores[p[i]] || 0, p[i + 1]);
+              }
+            }
+          });
+        });
+        return scores;
+      });
+  }
+  function search(q) {
+    var ts = terms(q);
+    if (!ts.length) { return Promise.resolve([]); }
+    return Promise.all(ts.map(function (t, i) { return lookup(t, i === ts.length - 1); }))
+      .then(function (lists) {
+        var total = lists[0];
+        lists.slice(1).forEach(function (scores) {
+          Object.keys(total).forEach(function (id) {
+            if (scores[id]) { total[id] += scores[id]; } else { delete total[id]; }
+          });
+        });
+        var ids = Object.keys(total).sort(function (a, b) { return total[b] - total[a] || a - b; })
+          .slice(0, 20).map(Number);
+        var chunks = {};
+        ids.forEach(function (id) { chunks[Math.floor(id / meta.chunk)] = true; });
+        return Promise.all(Object.keys(chunks).map(function (n) {
+          return get("d-" + n + ".json").then(function (docs) { chunks[n] = docs; });
+        })).then(function () {
+          return ids.map(function (id) {
+            return (chunks[Math.floor(id / meta.chunk)] || [])[id % meta.chunk];
+          }).filter(Boolean);
+        });
+      });
+  }
+  function esc(s) {
+    return String(s).replace(/[&<>"]/g, function (c) {
+      return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c];
+    });
+  }
+  document.addEventListener("DOMContentLoaded", function () {
+    var input = document.getElementById("site-search");
+    var out = document.getElementById("site-search-results");
+    if (!input || !out) { return; }
+    var style = document.createElement("style");
+    style.textContent = ".site-search{position:relative}" +
+      ".site-search input{padding:.3rem .6rem;border-radius:6px;border:1px solid #334155;font-size:.85rem;width:14rem}" +
+      "#site-search-results{position:absolute;right:0;top:2.2rem;width:22rem;max-height:70vh;overflow:auto;" +
+      "background:#fff;border:1px solid #e2e8f0;border-radius:8px;box-shadow:0 4px 16px rgba(0,0,0,.12);z-index:200}" +
+      "#site-search-results a{display:block;padding:.55rem .8rem;color:#1a1a2e;border-bottom:1px solid #f1f5f9}" +
+      "#site-search-results small{display:block;color:#555}";
+    document.head.appendChild(style);
+    var seq = 0;
+    input.addEventListener("input", function () {
+      var q = input.value, mine = ++seq;
+      if (!q.trim()) { out.hidden = true; return; }
+      (meta ? Promise.resolve(meta) : get("index.json").then(function (m) { meta = m; return m; }))
+        .then(function () { return search(q); })
+        .then(function (docs) {
+          if (mine !== seq) { return; }
+          out.innerHTML = docs.length ? docs.map(function (d) {
+            return '<a href="' + esc(d[0]) + '">' + esc(d[1]) + "<small>" + esc(d[2]) + "</small></a>";
+          }).join("") : "<a>No matching guides</a>";
+          out.hidden = false;
+        });
+    });
+  });
+})();
+""".replace("{STOPWORDS}", json.dumps(sorted(STOPWORDS)))
@@ -0,0 +1,172 @@
+"""Sitemap and Atom feed for the built site, with change-aware lastmod dates.
+
+build.py calls ChangeStore.note() for every HTML page with a hash of what
+the page is made from, keeps the store under .build-cache, and calls
+site_files() to write:
+
+  sitemap.xml             every page with its <lastmod>; past MAX_URLS it
+                          becomes a sitemap index of the shards below
+  sitemaps/sitemap-<n>.xml  MAX_URLS pages each (large sites only)
+  feed.xml                Atom feed of the most recently updated guides
+
+A page's lastmod is the build time at which its content hash last changed,
+never a file mtime, so checkouts, copies and no-op rebuilds do not make
+crawlers or feed readers fetch anything again. The store lives in the
+gitignored .build-cache, so a fresh clone seeds it from the sitemap.xml
+already published in OUT (see ChangeStore.seed()).
+"""
+
+import calendar
+import json
+import time
+import xml.etree.ElementTree as ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+CHANGES_VERSION = 1
+# Protocol limit per sitemap file (sitemaps.org); the index can list 50,000 shards.
+MAX_URLS = 50000
+FEED_ENTRIES = 50
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def w3c_time(seconds):
+    """UTC timestamp in the W3C/RFC 3339 form both sitemaps and Atom accept."""
+    return time.strftime(TIME_FORMAT, time.gmtime(seconds))
+
+def page_url(site_url, rel):
+    """Public URL of an output path; index.html files map to their directory."""
+    if rel == "index.html" or rel.endswith("/index.html"):
+        rel = rel[:-len("index.html")]
+    return f"{site_url.rstrip('/')}/{rel}"
+
+def _sitemap_entries(path):
+    """[(loc, lastmod text)] of a sitemap or sitemap index file ([] if unreadable)."""
+    try:
+        root = ElementTree.parse(path).getroot()
+    except (OSError, ElementTree.ParseError):
+        return []
+    return [(item.findtext(f"{{{SITEMAP_NS}}}loc", ""), item.findtext(f"{{{SITEMAP_NS}}}lastmod", ""))
+            for item in root]
+
+def published_lastmods(out_dir, site_url):
+    """{output path: lastmod seconds} from the sitemap.xml (and its shards) published in out_dir."""
+    base = site_url.rstrip("/") + "/"
+    lastmods = {}
+    entries = _sitemap_entries(out_dir / "sitemap.xml")
+    for loc, lastmod in entries:
+        if not loc.startswith(base):
+            continue
+        rel = loc[len(base):]
+        if rel.startswith("sitemaps/") and rel.endswith(".xml"):
+            entries.extend(_sitemap_entries(out_dir / rel))
+            continue
+        if rel == "" or rel.endswith("/"):
+            rel += "index.html"
+        try:
+            lastmods[rel] = calendar.timegm(time.strptime(lastmod, TIME_FORMAT))
+        except ValueError:
+            continue
+    return lastmods
+
+class ChangeStore:
+    """Content hash, lastmod and feed metadata per page, persisted as JSON (path None: memory only)."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            data = json.loads(path.read_text(encoding="utf-8")) if path is not None else {}
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != CHANGES_VERSION:
+            data = {}
+        self.pages = data.get("pages", {})
+
+    def __contains__(self, key):
+        return key in self.pages
+
+    def seed(self, lastmods):
+        """Start from published lastmods; each page adopts the first hash noted for it."""
+        for key, lastmod in lastmods.items():
+            self.pages.setdefault(key, {"hash": None, "lastmod": lastmod, "title": None, "summary": None})
+
+    def note(self, key, content_hash, now, title=None, summary=None):
+        """Record key's current hash; its lastmod moves to now only if the hash changed."""
+        page = self.pages.get(key)
+        if page is not None and page["hash"] is None:
+            page["hash"] = content_hash
+        elif page is None or page["hash"] != content_hash:
+            page = self.pages[key] = {"hash": content_hash, "lastmod": now}
+        page["title"] = title
+        page["summary"] = summary
+
+    def retain(self, keys):
+        for key in list(self.pages):
+            if key not in keys:
+                del self.pages[key]
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": CHANGES_VERSION, "pages": self.pages}
+        self.path.write_text(json.dumps(data, separators=(",", ":"), sort_keys=True), encoding="utf-8")
+
+def _urlset(site_url, items):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<urlset xmlns="{SITEMAP_NS}">']
+    for rel, page in items:
+        lines.append(f"<url><loc>{escape(page_url(site_url, rel))}</loc>"
+                     f"<lastmod>{w3c_time(page['lastmod'])}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+def _feed(site_url, title, author, pages):
+    """Atom feed of the FEED_ENTRIES pages with a title, newest first."""
+    entries = sorted(((rel, page) for rel, page in pages if page["title"]),
+                     key=lambda item: (-item[1]["lastmod"], item[0]))[:FEED_ENTRIES]
+    home = page_url(site_url, "index.html")
+    updated = max((page["lastmod"] for _, page in entries), default=0)
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<title>{escape(title)}</title>",
+        f"<id>{escape(home)}</id>",
+        f"<link rel=\"alternate\" href={quoteattr(home)}/>",
+        f"<link rel=\"self\" href={quoteattr(page_url(site_url, 'feed.xml'))}/>",
+        f"<updated>{w3c_time(updated)}</updated>",
+        # RFC 4287: required at feed level when the entries carry no author.
+        f"<author><name>{escape(author)}</name></author>",
+    ]
+    for rel, page in entries:
+        url = page_url(site_url, rel)
+        lines += [
+            "<entry>",
+            f"<title>{escape(page['title'])}</title>",
+            f"<id>{escape(url)}</id>",
+            f"<link href={quoteattr(url)}/>",
+            f"<updated>{w3c_time(page['lastmod'])}</updated>",
+        ]
+        if page["summary"]:
+            lines.append(f"<summary>{escape(page['summary'])}</summary>")
+        lines.append("</entry>")
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+def site_files(store, site_url, feed_title, feed_author):
+    """Return {relative path: text} for sitemap.xml, its shards and feed.xml."""
+    pages = sorted(store.pages.items())
+    files = {}
+    if len(pages) <= MAX_URLS:
+        files["sitemap.xml"] = _urlset(site_url, pages)
+    else:
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<sitemapindex xmlns="{SITEMAP_NS}">']
+        for n, start in enumerate(range(0, len(pages), MAX_URLS), 1):
+            shard = pages[start:start + MAX_URLS]
+            rel = f"sitemaps/sitemap-{n}.xml"
+            files[rel] = _urlset(site_url, shard)
+            lastmod = max(page["lastmod"] for _, page in shard)
+            lines.append(f"<sitemap><loc>{escape(page_url(site_url, rel))}</loc>"
+                         f"<lastmod>{w3c_time(lastmod)}</lastmod></sitemap>")
+        lines.append("</sitemapindex>")
+        files["sitemap.xml"] = "\n".join(lines) + "\n"
+    files["feed.xml"] = _feed(site_url, feed_title, feed_author, pages)
+    return files